@@ -1,25 +1,16 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
+import argparse
 import schedule
 import time
 import threading
-from multiprocessing import Process, Queue
-from scrapy.crawler import CrawlerProcess
-from scraper.scraper.spiders.spider import Spider
-from datetime import datetime
+from scraper.scraper import runner
 from utills import (
-    cluster_articles,
-    summarize_articles,
-    assign_category,
-    insert_data,
     get_category_data,
-    remove_duplicates_by_title,
-    add_id_to_grouped_articles,
     get_article,
     text_search,
     get_recent_top_news,
     create_feature_article,
-    assign_week_label,
 )
 import json
 
@@ -29,77 +20,13 @@ CORS(app, origins=["http://localhost:5173"])
 
 
 ### Scrapy spider runner ###
-def run_spider(queue):
-    try:
-        with open("config.json", "r", encoding="utf-8") as file:
-            config = json.load(file)
-
-        use_proxies = config.get("use_proxies", "False").lower() == "true"
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"results/raw_articles/scraped_results_{timestamp}.json"
-
-        scrapy_settings = {
-            "FEEDS": {
-                output_filename: {
-                    "format": "json",
-                    "encoding": "utf8",
-                    "ensure_ascii": False,
-                },
-            }
-        }
-
-        if use_proxies:
-            scrapy_settings.update(
-                {
-                    "DOWNLOADER_MIDDLEWARES": {
-                        "rotating_proxies.middlewares.RotatingProxyMiddleware": 610,
-                        "rotating_proxies.middlewares.BanDetectionMiddleware": 620,
-                    },
-                    "ROTATING_PROXY_LIST_PATH": "proxies.txt",
-                }
-            )
-
-        process = CrawlerProcess(scrapy_settings)
-        process.crawl(Spider)
-        process.start()
-
-        queue.put(output_filename)
-
-    except Exception as e:
-        print(f"Error running spider: {e}")
-        queue.put(None)
-
-
-def run_spider_in_process():
-    queue = Queue()
-    p = Process(target=run_spider, args=(queue,))
-    p.start()
-    p.join()
-
-    scraped_result_json = queue.get()
-    if scraped_result_json:
-        print("Scraped file location:", scraped_result_json)
-        scraped_result_json = assign_week_label(scraped_result_json)
-        scraped_result_json = assign_category(scraped_result_json)
-        scraped_result_json = remove_duplicates_by_title(scraped_result_json)
-
-        clustered_json = cluster_articles(
-            scraped_result_json, "results/clusterd_articles"
-        )
-        clustered_json = add_id_to_grouped_articles(clustered_json)
-
-        summerized_json = summarize_articles(
-            clustered_json, "results/summarized_articles"
-        )
-        insert_data(summerized_json)
+def run_spider_in_process(resume=False):
+    if runner.run_spider_in_process(resume=resume):
         create_feature_article()
-    else:
-        print("Failed to scrape articles.")
 
 
-def schedule_runner():
-    run_spider_in_process()
+def schedule_runner(resume=False):
+    run_spider_in_process(resume=resume)
     schedule.every(6).hours.do(run_spider_in_process)
 
     while True:
@@ -224,6 +151,19 @@ def load_articles():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume the last incomplete crawl job in the background",
+    )
+    args = parser.parse_args()
+
+    if args.resume:
+        threading.Thread(
+            target=run_spider_in_process, kwargs={"resume": True}, daemon=True
+        ).start()
+
     # t = threading.Thread(target=schedule_runner)
     # t.daemon = True
     # t.start()
@@ -0,0 +1,76 @@
+"""Micro-benchmark for the spider's link filter.
+
+Runs the compiled LinkFilter from config.json and the old per-link
+substring scan over a saved link dump and prints links/sec for both.
+
+    python -m benchmarks.link_filter [links_file] [repeat]
+"""
+
+import json
+import re
+import sys
+import timeit
+
+from scraper.scraper.link_filter import LinkFilter
+
+
+def legacy_filter(links):
+    # copy of Spider.filter_social_links before the filter moved to config.json
+    http_links = [link for link in links if re.match(r"^https?://", link)]
+
+    unwanted_words = [
+        "visekari", "paradeese", "raaga", "seya", "pini-viyana",
+        "hathweni-peya", "sasankara", "theeranaya", "vasantham", "/ta/",
+        "webgossip", "/pulse.lk/", "/techguru", "  /alumexgroup.com/",
+        "/www.whatsapp.com/", "  /youtu.be/", " accounts.google.com",
+        "/www.etunes.lk/", "/fortunacreatives.com/", "/get.microsoft.com/",
+        "/workspaceupdates.googleblog.com/", "/gssports.lk/",
+        "/lakhandaradio.lk/", "/yfm.lk/", "hirutv.lk", "hirutvnews",
+        "/www.shaafm.lk/", "/www.goldfm.lk/", "hirufm", "shaafm", "sunfm",
+        "facebook.com", "/tamil/",
+    ]  # fmt: skip
+
+    social_media_patterns = [
+        "facebook.com", "twitter.com", "youtube.com", "instagram.com",
+        "linkedin.com", "tiktok.com", "whatsapp.com",
+    ]  # fmt: skip
+
+    filtered_links = []
+    for link in http_links:
+        if any(word in link for word in unwanted_words):
+            continue
+        if link.endswith(".jpg"):
+            continue
+        if any(sm in link for sm in social_media_patterns):
+            continue
+        filtered_links.append(link)
+
+    return filtered_links
+
+
+def run(links_file="results/scraped_links/main_links.txt", repeat=20):
+    with open(links_file, "r", encoding="utf-8") as file:
+        links = [line.strip() for line in file if line.strip()]
+
+    with open("config.json", "r", encoding="utf-8") as file:
+        config = json.load(file)
+
+    link_filter = LinkFilter.from_config(config.get("link_filter", {}))
+
+    print(f"{len(links)} links from {links_file}, best of {repeat} runs")
+    for name, func in (("legacy", legacy_filter), ("compiled", link_filter)):
+        best = min(timeit.repeat(lambda: func(links), number=1, repeat=repeat))
+        kept = len(func(links))
+        print(f"{name:>9}: {len(links) / best:>12,.0f} links/sec  kept {kept}")
+
+    # links the two filters disagree on, e.g. the legacy entries with stray
+    # leading spaces that never matched
+    legacy_kept = set(legacy_filter(links))
+    compiled_kept = set(link_filter(links))
+    print(f"only kept by legacy: {len(legacy_kept - compiled_kept)}")
+    print(f"only kept by compiled: {len(compiled_kept - legacy_kept)}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(*args[:1], *(int(arg) for arg in args[1:2]))
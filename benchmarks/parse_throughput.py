@@ -0,0 +1,225 @@
+"""Parse-throughput benchmark for the spider's CPU-side hot paths.
+
+Runs Spider.parse_news, Spider.filter_social_links and Spider.process_date
+over saved article pages and reports, per source and per stage, pages/sec,
+p50/p99 per-page time and peak allocated memory per page. Results are
+written as JSON so runs can be compared between commits.
+
+Pages come from a fixture archive recorded with fixture_mode "record"
+(--archive) or from a folder of saved pages laid out as
+<corpus>/<host>/<anything>.html with the page URL on the first line of a
+sibling <anything>.url file (--corpus).
+
+    python -m benchmarks.parse_throughput --archive results/fixtures/crawl_fixtures.db
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from urllib.parse import urlparse
+
+import scrapy
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from scraper.scraper.replay import FixtureArchive
+from scraper.scraper.spiders.spider import Spider
+
+
+def load_archive(path):
+    archive = FixtureArchive(path)
+    pages = [
+        (url, body)
+        for url, status, headers, body in archive
+        if status == 200 and b"<html" in body[:2048].lower()
+    ]
+    archive.close()
+    return pages
+
+
+def load_corpus(folder):
+    pages = []
+    for html_path in sorted(glob.glob(os.path.join(folder, "*", "*.html"))):
+        url_path = os.path.splitext(html_path)[0] + ".url"
+        if os.path.exists(url_path):
+            with open(url_path, "r", encoding="utf-8") as file:
+                url = file.readline().strip()
+        else:
+            host = os.path.basename(os.path.dirname(html_path))
+            url = f"https://{host}/{os.path.basename(html_path)}"
+
+        with open(html_path, "rb") as file:
+            pages.append((url, file.read()))
+    return pages
+
+
+def source_for(spider, url):
+    host = (urlparse(url).hostname or "").lower()
+    for source, domains in spider.allowed_domains_by_source.items():
+        if any(host == domain or host.endswith("." + domain) for domain in domains):
+            return source
+    return None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(timings, peaks):
+    total = sum(timings)
+    return {
+        "pages": len(timings),
+        "pages_per_sec": round(len(timings) / total, 1) if total else None,
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 4),
+        "mean_peak_alloc_kb": round(sum(peaks) / len(peaks) / 1024, 2),
+    }
+
+
+def stages(spider, source):
+    """Map stage name to (prepare, func); only ``func(prepare(response))`` is timed."""
+    rules = spider.parsing_rules[source]
+
+    def uncached(response):
+        # DateParser memoizes parse; without this every timed call is a cache hit
+        date_parser = spider.date_parsers.get(source)
+        if date_parser is not None:
+            date_parser.parse.cache_clear()
+        return response
+
+    return {
+        "parse_news": (
+            uncached,
+            lambda response: list(spider.parse_news(response, source)),
+        ),
+        "filter_social_links": (
+            lambda response: [
+                response.urljoin(link)
+                for link in response.css("a::attr(href)").getall()
+            ],
+            spider.filter_social_links,
+        ),
+        "process_date": (
+            lambda response: uncached(response).css(rules["date"]).get(),
+            lambda raw_date: spider.process_date(raw_date, source),
+        ),
+    }
+
+
+def run(pages, repeat=3):
+    crawler = get_crawler(Spider)
+    # replay mode: in-memory seen store and no freshness cutoff
+    spider = Spider.from_crawler(crawler, fixture_mode="replay")
+
+    by_source = {}
+    for url, body in pages:
+        source = source_for(spider, url)
+        if source:
+            by_source.setdefault(source, []).append((url, body))
+
+    results = {}
+    for source, source_pages in by_source.items():
+        results[source] = {}
+        for stage, (prepare, func) in stages(spider, source).items():
+            timings = []
+            peaks = []
+            for url, body in source_pages:
+                # a fresh response each time so parsel's cached tree is not reused
+                # parse_news reads response.meta, which needs a request
+                def prepared():
+                    return prepare(
+                        HtmlResponse(
+                            url=url,
+                            body=body,
+                            encoding="utf-8",
+                            request=scrapy.Request(url),
+                        )
+                    )
+
+                func(prepared())
+
+                best = None
+                for _ in range(repeat):
+                    data = prepared()
+                    start = time.perf_counter()
+                    func(data)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                timings.append(best)
+
+                data = prepared()
+                tracemalloc.start()
+                func(data)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+            results[source][stage] = summarize(timings, peaks)
+
+    spider.seen_urls.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive", help="fixture archive recorded by the spider")
+    parser.add_argument("--corpus", help="folder of saved pages, one subfolder per host")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output-folder", default="results/benchmarks")
+    args = parser.parse_args()
+
+    if not args.archive and not args.corpus:
+        parser.error("one of --archive or --corpus is required")
+
+    pages = load_archive(args.archive) if args.archive else load_corpus(args.corpus)
+    revision = git_revision()
+    results = run(pages, repeat=args.repeat)
+
+    for source, source_results in results.items():
+        print(source)
+        for stage, stats in source_results.items():
+            print(
+                f"  {stage:<20} {stats['pages']:>5} pages "
+                f"{stats['pages_per_sec']:>10} pages/s  "
+                f"p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms  "
+                f"peak {stats['mean_peak_alloc_kb']:.1f} KiB"
+            )
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = os.path.join(
+        args.output_folder, f"parse_throughput_{timestamp}_{revision}.json"
+    )
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "revision": revision,
+                "timestamp": timestamp,
+                "repeat": args.repeat,
+                "results": results,
+            },
+            file,
+            indent=4,
+        )
+    print(f"Benchmark results saved to '{output_path}'")
+
+
+if __name__ == "__main__":
+    main()
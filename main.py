@@ -1,92 +1,19 @@
+import argparse
 import schedule
 import time
-from multiprocessing import Process, Queue
-from scrapy.crawler import CrawlerProcess
-from scraper.scraper.spiders.spider import Spider
-from datetime import datetime
-from utills import (
-    cluster_articles,
-    summarize_articles,
-    assign_category,
-    insert_data,
-    remove_duplicates_by_title,
-    add_id_to_grouped_articles,
-)
-import json
-
-
-def run_spider(queue):
-    """Runs the Scrapy spider and sends the output filename via queue."""
-    try:
-        with open("config.json", "r", encoding="utf-8") as file:
-            config = json.load(file)
-
-        use_proxies = config.get("use_proxies", "False").lower() == "true"
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"results/raw_articles/scraped_results_{timestamp}.json"
-
-        scrapy_settings = {
-            "FEEDS": {
-                output_filename: {
-                    "format": "json",
-                    "encoding": "utf8",
-                    "ensure_ascii": False,
-                },
-            }
-        }
-
-        if use_proxies:
-            scrapy_settings.update(
-                {
-                    "DOWNLOADER_MIDDLEWARES": {
-                        "rotating_proxies.middlewares.RotatingProxyMiddleware": 610,
-                        "rotating_proxies.middlewares.BanDetectionMiddleware": 620,
-                    },
-                    "ROTATING_PROXY_LIST_PATH": "proxies.txt",
-                }
-            )
-
-        process = CrawlerProcess(scrapy_settings)
-        process.crawl(Spider)
-        process.start()
-
-        queue.put(output_filename)
-
-    except Exception as e:
-        print(f"Error running spider: {e}")
-        queue.put(None)
-
-
-def run_spider_in_process():
-    """Runs the Scrapy spider in a separate process and retrieves the output file."""
-    queue = Queue()
-    p = Process(target=run_spider, args=(queue,))
-    p.start()
-    p.join()
-
-    scraped_result_json = queue.get()  #
-    if scraped_result_json:
-        print("Scraped file location:", scraped_result_json)
-        scraped_result_json = assign_category(scraped_result_json)
-        scraped_result_json = remove_duplicates_by_title(scraped_result_json)
-
-        clustered_json = cluster_articles(
-            scraped_result_json, "results/clusterd_articles"
-        )
-        clustered_json = add_id_to_grouped_articles(clustered_json)
-
-        summerized_json = summarize_articles(
-            clustered_json, "results/summarized_articles"
-        )
-        insert_data(summerized_json)
-
-    else:
-        print("Failed to scrape articles.")
+from scraper.scraper.runner import run_spider_in_process
 
 
 if __name__ == "__main__":
-    run_spider_in_process()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume the last incomplete crawl job instead of starting a new one",
+    )
+    args = parser.parse_args()
+
+    run_spider_in_process(resume=args.resume)
 
     schedule.every(6).hours.do(run_spider_in_process)
 
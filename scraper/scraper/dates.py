@@ -0,0 +1,75 @@
+import datetime
+import email.utils
+import functools
+import re
+
+import pytz
+
+
+class DateParser:
+    """Parse one source's raw publish dates into aware UTC datetimes.
+
+    ``formats`` are tried in order; each is a ``strptime`` format or
+    ``"iso"`` for ``datetime.fromisoformat``, and ISO parsing is always the
+    last fallback. Dates without an offset are taken to be in ``timezone``.
+    ``strip_pattern`` is removed from the raw string first (e.g. a leading
+    weekday). Results, including misses, are memoized per raw string, since
+    listing and article pages repeat the same few timestamps.
+    """
+
+    def __init__(
+        self, formats, timezone="Asia/Colombo", strip_pattern=None, cache_size=4096
+    ):
+        self.formats = list(formats)
+        if "iso" not in self.formats:
+            self.formats.append("iso")
+        self.timezone = pytz.timezone(timezone)
+        self.strip_pattern = re.compile(strip_pattern) if strip_pattern else None
+        self.parse = functools.lru_cache(maxsize=cache_size)(self._parse)
+
+    @classmethod
+    def from_rules(cls, rules):
+        return cls(
+            rules.get("date_formats", []),
+            timezone=rules.get("timezone", "Asia/Colombo"),
+            strip_pattern=rules.get("date_strip_pattern"),
+        )
+
+    def _parse(self, raw_date):
+        cleaned_date = " ".join(raw_date.split())
+        if self.strip_pattern:
+            cleaned_date = self.strip_pattern.sub("", cleaned_date).strip()
+
+        for date_format in self.formats:
+            try:
+                if date_format == "iso":
+                    date_obj = datetime.datetime.fromisoformat(cleaned_date)
+                else:
+                    date_obj = datetime.datetime.strptime(cleaned_date, date_format)
+            except ValueError:
+                continue
+
+            if date_obj.tzinfo is None:
+                date_obj = self.timezone.localize(date_obj)
+            return date_obj.astimezone(pytz.utc)
+
+        return None
+
+
+def parse_feed_date(raw_date, timezone="Asia/Colombo"):
+    """Parse an RSS (RFC 822) or Atom/sitemap (W3C/ISO 8601) date into UTC."""
+    if not raw_date:
+        return None
+
+    raw_date = raw_date.strip()
+    try:
+        date_obj = email.utils.parsedate_to_datetime(raw_date)
+    except (TypeError, ValueError):
+        try:
+            date_obj = datetime.datetime.fromisoformat(raw_date.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    if date_obj.tzinfo is None:
+        date_obj = pytz.timezone(timezone).localize(date_obj)
+    return date_obj.astimezone(pytz.utc)
@@ -0,0 +1,50 @@
+from cssselect import SelectorError
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+
+class ExtractionPlan:
+    """A source's parsing_rules compiled once into lxml XPath objects.
+
+    The CSS selectors are translated with parsel's own translator, so
+    ``::text`` and ``::attr()`` behave exactly as in ``response.css``, and
+    every field is then evaluated against the same parsed lxml tree.
+    Invalid or missing selectors raise ValueError when the plan is built,
+    instead of silently producing None for every page.
+    """
+
+    fields = ("title", "content", "date", "cover_image")
+    # fields whose matches are joined instead of taking the first one
+    joined_fields = {"content"}
+
+    translator = HTMLTranslator()
+
+    def __init__(self, rules):
+        self.xpaths = {}
+        for field in self.fields:
+            css = rules.get(field)
+            if not css:
+                raise ValueError(f"missing '{field}' selector")
+
+            try:
+                xpath = self.translator.css_to_xpath(css)
+                self.xpaths[field] = etree.XPath(xpath, smart_strings=False)
+            except (SelectorError, etree.XPathError) as e:
+                raise ValueError(f"invalid '{field}' selector {css!r}: {e}")
+
+    def extract(self, response):
+        """Return the fields of one page: the first match, or all matches joined."""
+        root = response.selector.root
+        extracted = {}
+        for field, xpath in self.xpaths.items():
+            matches = [
+                etree.tostring(match, encoding="unicode", method="html", with_tail=False)
+                if isinstance(match, etree._Element)
+                else str(match)
+                for match in xpath(root)
+            ]
+            if field in self.joined_fields:
+                extracted[field] = " ".join(matches)
+            else:
+                extracted[field] = matches[0] if matches else None
+        return extracted
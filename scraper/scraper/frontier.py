@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import time
+
+from utills.ids import canonical_url
+
+
+class SeenUrlStore:
+    """Persistent record of article URLs fetched by previous crawls.
+
+    Each URL keeps the time it was last fetched, keyed on its canonical
+    form so tracking parameters and http/https variants share one entry. A
+    URL counts as seen while that timestamp is younger than ``ttl_hours``;
+    after that it is fetched again. Pages that produced no item (error
+    pages, partial renders) only count as seen for ``empty_ttl_hours``, so
+    they are retried soon. All live entries are loaded into a set when the
+    store is opened, so lookups in the parse callbacks never touch the
+    disk.
+
+    ``mark`` is committed every ``batch_size`` marks, so a killed crawl
+    keeps most of them. ``mark_exported`` is for pages whose item went to
+    the output: those are only committed on ``close``, after the outputs are
+    written, and a resumed job recovers them from its output file instead.
+    """
+
+    def __init__(self, db_path, ttl_hours=72, empty_ttl_hours=6, batch_size=200):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_hours * 3600
+        self.empty_ttl_seconds = empty_ttl_hours * 3600
+        self.batch_size = batch_size
+
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        # parallel crawl workers share the file; wait for their commits
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS seen_urls (
+                url TEXT PRIMARY KEY,
+                last_fetched REAL NOT NULL,
+                produced_item INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self.conn.commit()
+
+        self.seen = set()
+        self.pending = {}
+        self.exported = {}
+        self._load()
+
+    def _load(self):
+        now = time.time()
+        self.conn.execute(
+            """DELETE FROM seen_urls
+               WHERE last_fetched < ?
+                  OR (produced_item = 0 AND last_fetched < ?)""",
+            (now - self.ttl_seconds, now - self.empty_ttl_seconds),
+        )
+        self.conn.commit()
+        for (url,) in self.conn.execute("SELECT url FROM seen_urls"):
+            self.seen.add(url)
+
+    def __contains__(self, url):
+        return canonical_url(url) in self.seen
+
+    def __len__(self):
+        return len(self.seen)
+
+    def mark(self, url, produced_item=False):
+        """Record that ``url`` was fetched now."""
+        self._add(self.pending, url, produced_item)
+        if len(self.pending) >= self.batch_size:
+            self._write(self.pending)
+
+    def mark_exported(self, url):
+        """Record that ``url`` produced an item; committed on ``close``."""
+        self._add(self.exported, url, True)
+
+    def _add(self, pending, url, produced_item):
+        url = canonical_url(url)
+        self.seen.add(url)
+        previous = pending.get(url)
+        produced_item = produced_item or (previous is not None and previous[1])
+        pending[url] = (time.time(), produced_item)
+
+    def _write(self, pending):
+        if not pending:
+            return
+
+        self.conn.executemany(
+            """INSERT INTO seen_urls (url, last_fetched, produced_item)
+               VALUES (?, ?, ?)
+               ON CONFLICT(url) DO UPDATE SET
+                   last_fetched = excluded.last_fetched,
+                   produced_item = MAX(produced_item, excluded.produced_item)""",
+            [
+                (url, fetched, int(produced))
+                for url, (fetched, produced) in pending.items()
+            ],
+        )
+        self.conn.commit()
+        pending.clear()
+
+    def flush(self):
+        self._write(self.pending)
+        self._write(self.exported)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
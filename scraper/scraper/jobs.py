@@ -0,0 +1,83 @@
+import glob
+import json
+import os
+import threading
+from datetime import datetime
+
+JOBS_FOLDER = "results/jobs"
+
+
+class CrawlJob:
+    """Checkpoint directory of one crawl cycle, e.g. ``results/jobs/<timestamp>/``.
+
+    ``job.json`` records the run's timestamp, output files and status
+    ("running", "interrupted", "failed", "done"). ``crawl/`` is handed to
+    Scrapy as ``JOBDIR``. A job that is not "done" can be resumed and its
+    output files are appended to. Scrapy only saves its queue on a graceful
+    shutdown ("interrupted"), which a resume continues; after a kill the
+    crawl starts over from the homepages and the seen-url store skips the
+    articles the job already wrote.
+    """
+
+    def __init__(self, folder, info=None):
+        self.folder = folder
+        self.info_path = os.path.join(folder, "job.json")
+        self.info = info or {}
+        # shard callbacks update the job from several threads
+        self.lock = threading.Lock()
+
+    @classmethod
+    def create(cls, jobs_folder=JOBS_FOLDER):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        folder = os.path.join(jobs_folder, timestamp)
+        os.makedirs(folder, exist_ok=True)
+
+        job = cls(folder, {"timestamp": timestamp, "status": "running", "resumes": 0})
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, folder):
+        with open(os.path.join(folder, "job.json"), "r", encoding="utf-8") as file:
+            return cls(folder, json.load(file))
+
+    @classmethod
+    def last_incomplete(cls, jobs_folder=JOBS_FOLDER):
+        """Return the newest job that never reached "done", or None."""
+        for info_path in sorted(
+            glob.glob(os.path.join(jobs_folder, "*", "job.json")), reverse=True
+        ):
+            try:
+                job = cls.load(os.path.dirname(info_path))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Skipping unreadable job '{info_path}': {e}")
+                continue
+
+            if job.info.get("status") != "done":
+                return job
+        return None
+
+    @property
+    def timestamp(self):
+        return self.info["timestamp"]
+
+    @property
+    def crawl_folder(self):
+        return os.path.join(self.folder, "crawl")
+
+    def update(self, **changes):
+        with self.lock:
+            self.info.update(changes)
+            self.save()
+
+    def append(self, key, value):
+        """Add ``value`` to the list stored under ``key``."""
+        with self.lock:
+            self.info[key] = self.info.get(key, []) + [value]
+            self.save()
+
+    def save(self):
+        # written to a temporary file first so a crash never leaves half a job.json
+        with open(self.info_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self.info, file, indent=4)
+        os.replace(self.info_path + ".tmp", self.info_path)
@@ -0,0 +1,62 @@
+import re
+
+
+class LinkFilter:
+    """Block/allow matcher for crawled links, compiled once from config.
+
+    ``blocked_words`` are substrings matched anywhere in the link and are
+    folded into a single regex together with ``blocked_extensions``.
+    ``blocked_domains`` are matched against the link's host and all of its
+    parent domains, so ``facebook.com`` also blocks ``m.facebook.com``.
+    """
+
+    def __init__(self, blocked_words=(), blocked_domains=(), blocked_extensions=()):
+        alternatives = [re.escape(word.strip()) for word in blocked_words if word.strip()]
+        extensions = [re.escape(ext.strip()) for ext in blocked_extensions if ext.strip()]
+        if extensions:
+            alternatives.append(r"(?:%s)$" % "|".join(extensions))
+
+        self.blocked_pattern = (
+            re.compile("|".join(alternatives)) if alternatives else None
+        )
+        self.blocked_domains = frozenset(
+            domain.strip().lower().lstrip(".") for domain in blocked_domains
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            blocked_words=config.get("blocked_words", []),
+            blocked_domains=config.get("blocked_domains", []),
+            blocked_extensions=config.get("blocked_extensions", []),
+        )
+
+    def is_blocked_host(self, link):
+        if not self.blocked_domains:
+            return False
+
+        # scheme://user@host:port/... -> host
+        host = link.split("/", 3)[2].rpartition("@")[2].split(":", 1)[0].lower()
+        while host:
+            if host in self.blocked_domains:
+                return True
+            host = host.partition(".")[2]
+        return False
+
+    def __call__(self, links):
+        search = self.blocked_pattern.search if self.blocked_pattern else None
+        filtered_links = []
+
+        for link in links:
+            if not link.startswith(("http://", "https://")):
+                continue
+
+            if search and search(link):
+                continue
+
+            if self.is_blocked_host(link):
+                continue
+
+            filtered_links.append(link)
+
+        return filtered_links
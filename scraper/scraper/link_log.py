@@ -0,0 +1,75 @@
+import glob
+import gzip
+import os
+import time
+from datetime import datetime
+
+
+class LinkLogWriter:
+    """Buffered, de-duplicated log of the links found during one crawl.
+
+    ``path`` is the configured base name, e.g. ``results/scraped_links/main_links.txt``.
+    Every run writes its own gzip file next to it
+    (``main_links_<timestamp>.txt.gz``) and only the newest ``keep_runs``
+    files are kept; parallel crawl workers pass a ``run_name`` so each
+    writes its own file. Links are written once per run, in batches, when the
+    buffer reaches ``buffer_size`` links, when ``flush_interval`` seconds
+    have passed, or on ``close``.
+    """
+
+    def __init__(
+        self, path, buffer_size=1000, flush_interval=30, keep_runs=20, run_name=None
+    ):
+        root, ext = os.path.splitext(path)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if run_name:
+            timestamp = f"{timestamp}_{run_name}"
+        self.path = f"{root}_{timestamp}{ext}.gz"
+        self.pattern = f"{root}_*{ext}.gz"
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.keep_runs = keep_runs
+
+        self.seen = set()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.count = 0
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def write(self, links):
+        for link in links:
+            if link not in self.seen:
+                self.seen.add(link)
+                self.buffer.append(link)
+
+        if (
+            len(self.buffer) >= self.buffer_size
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write("\n".join(self.buffer) + "\n")
+        self.count += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+
+        old_runs = sorted(glob.glob(self.pattern))[: -self.keep_runs or None]
+        for old_run in old_runs:
+            try:
+                os.remove(old_run)
+            except OSError as e:
+                print(f"Could not remove old link log '{old_run}': {e}")
+
+        if self.count:
+            print(f"{self.count} links saved to {self.path}")
@@ -3,11 +3,21 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import hashlib
+import os
+import sqlite3
+
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
+from scrapy.utils.httpobj import urlparse_cached
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from .proxy_pool import ProxyPool, probe_proxies
+from .replay import FixtureArchive, encode_headers
+
 
 class ScraperSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -101,3 +111,412 @@ class ScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class ConditionalRequestMiddleware:
+    """Revalidate feeds and sitemaps instead of downloading them again.
+
+    Requests flagged with ``meta["conditional"]`` are sent with the
+    ``If-None-Match``/``If-Modified-Since`` validators seen on the last
+    crawl. When the server answers 304, or the body digest matches the
+    stored one, ``meta["unchanged"]`` is set on the response so the spider
+    can skip re-enqueueing the page's links.
+
+    New validators are only saved when the crawl finishes cleanly: a page
+    counts as unchanged only once the links it led to were really fetched.
+    """
+
+    def __init__(self, cache_path):
+        folder = os.path.dirname(cache_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.conn = sqlite3.connect(cache_path, timeout=30)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                digest TEXT
+            )"""
+        )
+        self.conn.commit()
+        self.pending = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # a recording must archive full responses rather than 304s, and
+        # replayed fixtures never change, so every listing would look unchanged
+        if crawler.settings.get("FIXTURE_MODE") in ("record", "replay"):
+            raise NotConfigured
+        # a resumed crawl re-fetches everything its killed run may have skipped
+        if not crawler.settings.getbool("CONDITIONAL_REQUESTS_ENABLED", True):
+            raise NotConfigured
+        s = cls(crawler.settings.get("CONDITIONAL_CACHE_PATH", "http_validators.db"))
+        s.stats = crawler.stats
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def lookup(self, url):
+        return self.conn.execute(
+            "SELECT etag, last_modified, digest FROM validators WHERE url = ?",
+            (url,),
+        ).fetchone()
+
+    def process_request(self, request, spider):
+        if not request.meta.get("conditional"):
+            return None
+
+        cached = self.lookup(request.url)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                request.headers.setdefault("If-None-Match", etag)
+            if last_modified:
+                request.headers.setdefault("If-Modified-Since", last_modified)
+
+        # let the 304 reach the callback instead of being dropped as an error
+        request.meta.setdefault("handle_httpstatus_list", [304])
+        return None
+
+    def process_response(self, request, response, spider):
+        if not request.meta.get("conditional"):
+            return response
+
+        if response.status == 304:
+            self.stats.inc_value("conditional/not_modified")
+            request.meta["unchanged"] = True
+            return response
+
+        if response.status != 200:
+            return response
+
+        digest = hashlib.sha1(response.body).hexdigest()
+        cached = self.lookup(request.url)
+        if cached and cached[2] == digest:
+            self.stats.inc_value("conditional/same_digest")
+            request.meta["unchanged"] = True
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        self.pending[request.url] = (
+            etag.decode("latin-1") if etag else None,
+            last_modified.decode("latin-1") if last_modified else None,
+            digest,
+        )
+        return response
+
+    def spider_closed(self, spider, reason):
+        # an interrupted crawl keeps the old validators, so its pages are
+        # expanded again next time instead of looking unchanged
+        if reason == "finished":
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO validators (url, etag, last_modified, digest)
+                   VALUES (?, ?, ?, ?)""",
+                [(url, *row) for url, row in self.pending.items()],
+            )
+            self.conn.commit()
+        elif self.pending:
+            self.stats.set_value("conditional/discarded", len(self.pending))
+        self.conn.close()
+
+
+class AdaptiveThrottleMiddleware:
+    """Per-domain AIMD control of download delay and concurrency.
+
+    Every download slot (one per host) starts from the source's
+    ``throttle`` settings in ``parsing_rules``. Fast successful responses
+    shrink the delay additively and grow concurrency by about one request
+    per round trip; errors, timeouts and ban responses double the delay and
+    halve concurrency. The current values are published in the crawl stats
+    under ``throttle/<host>/...``.
+    """
+
+    ban_statuses = {403, 429, 503}
+
+    defaults = {
+        "start_delay": 1.0,
+        "min_delay": 0.0,
+        "max_delay": 30.0,
+        "delay_step": 0.25,
+        "start_concurrency": 1,
+        "max_concurrency": 8,
+        "target_latency": 2.0,
+    }
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.state = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def throttle_config(self, host, spider):
+        config = dict(self.defaults)
+        for source, rules in getattr(spider, "parsing_rules", {}).items():
+            domains = spider.allowed_domains_by_source.get(source, [])
+            if any(host == domain or host.endswith("." + domain) for domain in domains):
+                config.update(rules.get("throttle", {}))
+                break
+        return config
+
+    def get_slot(self, request, spider):
+        key = request.meta.get("download_slot")
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is None:
+            return None, None
+
+        if key not in self.state:
+            config = self.throttle_config(key, spider)
+            self.state[key] = {
+                "config": config,
+                "delay": config["start_delay"],
+                "concurrency": float(config["start_concurrency"]),
+            }
+            self.apply(key, slot)
+
+        return key, slot
+
+    def apply(self, key, slot):
+        state = self.state[key]
+        slot.delay = state["delay"]
+        slot.concurrency = max(1, int(state["concurrency"]))
+        self.stats.set_value(f"throttle/{key}/delay", round(slot.delay, 3))
+        self.stats.set_value(f"throttle/{key}/concurrency", slot.concurrency)
+
+    def increase(self, key):
+        state = self.state[key]
+        config = state["config"]
+        state["delay"] = max(config["min_delay"], state["delay"] - config["delay_step"])
+        state["concurrency"] = min(
+            config["max_concurrency"],
+            state["concurrency"] + 1 / max(1.0, state["concurrency"]),
+        )
+
+    def back_off(self, key):
+        state = self.state[key]
+        config = state["config"]
+        state["delay"] = min(
+            config["max_delay"], max(state["delay"] * 2, config["delay_step"])
+        )
+        state["concurrency"] = max(1.0, state["concurrency"] / 2)
+        self.stats.inc_value(f"throttle/{key}/backoffs")
+
+    def process_response(self, request, response, spider):
+        key, slot = self.get_slot(request, spider)
+        if slot is None:
+            return response
+
+        latency = request.meta.get("download_latency", 0)
+        if response.status in self.ban_statuses or response.status >= 500:
+            self.back_off(key)
+        elif latency <= self.state[key]["config"]["target_latency"]:
+            self.increase(key)
+
+        self.apply(key, slot)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key, slot = self.get_slot(request, spider)
+        if slot is not None:
+            self.back_off(key)
+            self.apply(key, slot)
+        return None
+
+
+class ProxyPoolMiddleware:
+    """Route requests through the best scoring proxy from a ProxyPool.
+
+    Responses with a ban status and download errors are charged to the
+    proxy that served them, and the request is retried through another
+    proxy up to ``PROXY_POOL_MAX_RETRIES`` times. When
+    ``PROXY_POOL_PROBE_URL`` is set the pool is probed once before the
+    crawl starts so dead proxies are quarantined up front.
+    """
+
+    ban_statuses = {403, 407, 429, 503}
+
+    def __init__(self, pool, stats, max_retries=3):
+        self.pool = pool
+        self.stats = stats
+        self.max_retries = max_retries
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pool = ProxyPool.from_file(
+            settings.get("PROXY_POOL_LIST_PATH", "proxies.txt"),
+            state_path=settings.get("PROXY_POOL_STATE_PATH"),
+        )
+
+        probe_url = settings.get("PROXY_POOL_PROBE_URL")
+        if probe_url:
+            probe_proxies(
+                pool,
+                probe_url,
+                timeout=settings.getfloat("PROXY_POOL_PROBE_TIMEOUT", 5),
+            )
+
+        s = cls(pool, crawler.stats, settings.getint("PROXY_POOL_MAX_RETRIES", 3))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_request(self, request, spider):
+        if "proxy" in request.meta and "proxy_pool_proxy" not in request.meta:
+            return None
+
+        proxy = self.pool.choose(urlparse_cached(request).hostname)
+        if proxy is None:
+            self.stats.inc_value("proxy_pool/no_proxy_available")
+            request.meta.pop("proxy", None)
+            request.meta.pop("proxy_pool_proxy", None)
+            return None
+
+        request.meta["proxy"] = f"http://{proxy}"
+        request.meta["proxy_pool_proxy"] = proxy
+        return None
+
+    def retry(self, request, reason):
+        retries = request.meta.get("proxy_pool_retries", 0) + 1
+        if retries > self.max_retries:
+            self.stats.inc_value("proxy_pool/gave_up")
+            return None
+
+        self.stats.inc_value(f"proxy_pool/retry/{reason}")
+        retry_request = request.copy()
+        retry_request.meta["proxy_pool_retries"] = retries
+        retry_request.dont_filter = True
+        return retry_request
+
+    def process_response(self, request, response, spider):
+        proxy = request.meta.get("proxy_pool_proxy")
+        if not proxy:
+            return response
+
+        domain = urlparse_cached(request).hostname
+        if response.status in self.ban_statuses:
+            self.pool.record_failure(proxy, domain, banned=True)
+            return self.retry(request, "ban") or response
+
+        self.pool.record_success(proxy, domain, request.meta.get("download_latency"))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        proxy = request.meta.get("proxy_pool_proxy")
+        if not proxy:
+            return None
+
+        self.pool.record_failure(proxy, urlparse_cached(request).hostname)
+        return self.retry(request, "error")
+
+    def spider_closed(self, spider):
+        self.pool.save()
+        spider.logger.info(
+            "Proxy pool: %d of %d proxies available"
+            % (len(self.pool.available()), len(self.pool))
+        )
+
+
+class FixtureRecorderMiddleware:
+    """Store every raw response in a FixtureArchive during a live crawl.
+
+    It sits next to the downloader, so responses are recorded before
+    decompression and redirect handling and replay exactly like the real
+    sites through ReplayDownloadHandler.
+    """
+
+    def __init__(self, archive, stats):
+        self.archive = archive
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if crawler.settings.get("FIXTURE_MODE") != "record":
+            raise NotConfigured
+        archive = FixtureArchive(crawler.settings.get("FIXTURE_ARCHIVE"))
+        s = cls(archive, crawler.stats)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_response(self, request, response, spider):
+        self.archive.put(
+            response.url,
+            response.status,
+            encode_headers(response.headers),
+            response.body,
+        )
+        self.stats.inc_value("fixtures/recorded")
+        if self.stats.get_value("fixtures/recorded") % 100 == 0:
+            self.archive.commit()
+        return response
+
+    def spider_closed(self, spider):
+        spider.logger.info(
+            "Recorded %d responses to %s" % (len(self.archive), self.archive.path)
+        )
+        self.archive.close()
+
+
+class BrowserRenderMiddleware:
+    """Fetch requests marked ``meta["rendered"]`` through a Selenium webdriver.
+
+    The driver is started with the Selenium 4 Service/options API;
+    ``SELENIUM_DRIVER_EXECUTABLE_PATH`` may be left empty to let Selenium
+    Manager find one. A driver that cannot start stops the crawl instead of
+    letting browser sources fall back to plain HTTP unnoticed.
+    """
+
+    drivers = {
+        "chrome": ("Chrome", "ChromeOptions", "ChromeService"),
+        "firefox": ("Firefox", "FirefoxOptions", "FirefoxService"),
+        "edge": ("Edge", "EdgeOptions", "EdgeService"),
+    }
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        name = (settings.get("SELENIUM_DRIVER_NAME") or "chrome").lower()
+        if name not in cls.drivers:
+            raise ValueError(f"Unsupported SELENIUM_DRIVER_NAME: {name}")
+
+        try:
+            from selenium import webdriver
+
+            driver_class, options_class, service_class = cls.drivers[name]
+            options = getattr(webdriver, options_class)()
+            for argument in settings.getlist("SELENIUM_DRIVER_ARGUMENTS"):
+                options.add_argument(argument)
+            service = getattr(webdriver, service_class)(
+                settings.get("SELENIUM_DRIVER_EXECUTABLE_PATH") or None
+            )
+            driver = getattr(webdriver, driver_class)(service=service, options=options)
+        except Exception as e:
+            raise RuntimeError(
+                f"A source needs browser rendering but the {name} webdriver "
+                f"could not start: {e}"
+            ) from e
+
+        s = cls(driver)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_request(self, request, spider):
+        if not request.meta.get("rendered"):
+            return None
+
+        self.driver.get(request.url)
+        spider.crawler.stats.inc_value("render/browser_pages")
+        return HtmlResponse(
+            self.driver.current_url,
+            body=self.driver.page_source,
+            encoding="utf-8",
+            request=request,
+        )
+
+    def spider_closed(self, spider):
+        self.driver.quit()
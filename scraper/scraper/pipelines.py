@@ -4,10 +4,120 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import os
+import queue
+import threading
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from utills import RecordWriter, generate_categories, get_week_label, read_records
+
 
 class ScraperPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class StreamingPipeline:
+    """Label, de-duplicate and categorize items while the crawl is running.
+
+    Items are handed to a background consumer thread as they are scraped,
+    so the LLM categorization overlaps with the crawl instead of waiting for
+    the FEEDS file. The consumer classifies items in micro-batches of up to
+    ``STREAMING_BATCH_SIZE`` articles, sending a smaller batch once no new
+    item has arrived for ``STREAMING_BATCH_WAIT`` seconds. Each processed
+    article is appended to the JSON Lines file ``STREAMING_OUTPUT``, in the
+    same shape ``assign_week_label``, ``remove_duplicates_by_title`` and
+    ``assign_category`` produce.
+    """
+
+    def __init__(self, output_path, batch_size=20, batch_wait=5.0):
+        self.output_path = output_path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue = queue.Queue()
+        self.writer = None
+        self.seen_ids = set()
+        self.seen_titles = set()
+        self.consumer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            crawler.settings.get("STREAMING_OUTPUT"),
+            batch_size=crawler.settings.getint("STREAMING_BATCH_SIZE", 20),
+            batch_wait=crawler.settings.getfloat("STREAMING_BATCH_WAIT", 5.0),
+        )
+
+    def open_spider(self, spider):
+        self.stats = spider.crawler.stats
+        # a resumed job appends to its earlier output; don't repeat those articles
+        if os.path.exists(self.output_path):
+            for article in read_records(self.output_path):
+                self.seen_titles.add(article.get("title"))
+                self.seen_ids.add(article.get("id"))
+        self.writer = RecordWriter(self.output_path, atomic=False)
+        self.consumer = threading.Thread(target=self.consume, daemon=True)
+        self.consumer.start()
+
+    def process_item(self, item, spider):
+        self.queue.put(ItemAdapter(item).asdict())
+        return item
+
+    def consume(self):
+        finished = False
+        while not finished:
+            # block for the first article, then take what arrives shortly after
+            batch = []
+            article = self.queue.get()
+            while article is not None:
+                batch.append(article)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    article = self.queue.get(timeout=self.batch_wait)
+                except queue.Empty:
+                    break
+            finished = article is None
+
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                print(f"Error processing articles: {e}")
+
+    def process_batch(self, batch):
+        articles = []
+        for article in batch:
+            title = article.get("title")
+            article_id = article.get("id")
+            if not title or title in self.seen_titles or article_id in self.seen_ids:
+                self.stats.inc_value("streaming/duplicates")
+                continue
+            self.seen_titles.add(title)
+            self.seen_ids.add(article_id)
+
+            week = get_week_label(article.get("date_published"))
+            if week:
+                article["week"] = week
+            articles.append(article)
+
+        if not articles:
+            return
+
+        categories = generate_categories(
+            {index: article["content"] for index, article in enumerate(articles)},
+            batch_size=self.batch_size,
+        )
+        for index, article in enumerate(articles):
+            article["category"] = categories[index]
+            self.writer.write(article)
+        self.stats.inc_value("streaming/categorized", len(articles))
+        self.stats.inc_value("streaming/batches")
+
+    def close_spider(self, spider):
+        self.queue.put(None)
+        self.consumer.join()
+        self.writer.close()
+
+        print(f"Streamed {self.writer.count} article(s) to '{self.output_path}'")
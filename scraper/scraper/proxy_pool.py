@@ -0,0 +1,173 @@
+import json
+import os
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+class ProxyPool:
+    """Health-scored pool of HTTP proxies.
+
+    Each proxy keeps exponentially weighted latency and success rate, both
+    overall and per target domain, plus a ban count. A failure puts the
+    proxy in quarantine for ``base_backoff * 2 ** (consecutive failures - 1)``
+    seconds (capped at ``max_backoff``). ``choose`` picks among the best
+    scoring available proxies for the domain. Scores are persisted to
+    ``state_path`` so the next run starts from what this one learned.
+    """
+
+    alpha = 0.3
+
+    def __init__(
+        self,
+        proxies,
+        state_path=None,
+        base_backoff=60,
+        max_backoff=6 * 3600,
+        top_k=5,
+    ):
+        self.state_path = state_path
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.top_k = top_k
+        self.proxies = {proxy: self.new_entry() for proxy in proxies}
+
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path, "r", encoding="utf-8") as file:
+                    saved = json.load(file)
+                for proxy, entry in saved.items():
+                    if proxy in self.proxies:
+                        self.proxies[proxy].update(entry)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading proxy scores: {e}")
+
+    @classmethod
+    def from_file(cls, list_path, state_path=None, **kwargs):
+        with open(list_path, "r", encoding="utf-8") as file:
+            proxies = [line.strip() for line in file if line.strip()]
+        return cls(proxies, state_path=state_path, **kwargs)
+
+    @staticmethod
+    def new_entry():
+        # optimistic prior so untried proxies still get picked
+        return {
+            "latency": 1.0,
+            "success": 0.5,
+            "bans": 0,
+            "failures": 0,
+            "quarantined_until": 0,
+            "domains": {},
+        }
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def update(self, stats, latency, success):
+        previous = stats.get("success", 0.5)
+        stats["success"] = self.alpha * success + (1 - self.alpha) * previous
+        if latency is not None:
+            previous = stats.get("latency", 1.0)
+            stats["latency"] = self.alpha * latency + (1 - self.alpha) * previous
+
+    def record_success(self, proxy, domain, latency):
+        entry = self.proxies.get(proxy)
+        if entry is None:
+            return
+
+        self.update(entry, latency, 1.0)
+        self.update(entry["domains"].setdefault(domain, {}), latency, 1.0)
+        entry["failures"] = 0
+        entry["quarantined_until"] = 0
+
+    def record_failure(self, proxy, domain, banned=False):
+        entry = self.proxies.get(proxy)
+        if entry is None:
+            return
+
+        self.update(entry, None, 0.0)
+        self.update(entry["domains"].setdefault(domain, {}), None, 0.0)
+        if banned:
+            entry["bans"] += 1
+
+        entry["failures"] += 1
+        backoff = min(
+            self.max_backoff, self.base_backoff * 2 ** (entry["failures"] - 1)
+        )
+        entry["quarantined_until"] = time.time() + backoff
+
+    def score(self, proxy, domain):
+        entry = self.proxies[proxy]
+        stats = entry["domains"].get(domain, entry)
+        return stats.get("success", 0.5) / (stats.get("latency", 1.0) + 0.1)
+
+    def available(self):
+        now = time.time()
+        return [
+            proxy
+            for proxy, entry in self.proxies.items()
+            if entry["quarantined_until"] <= now
+        ]
+
+    def choose(self, domain):
+        """Return a proxy for ``domain``, or None when every proxy is quarantined."""
+        candidates = self.available()
+        if not candidates:
+            return None
+
+        candidates.sort(key=lambda proxy: self.score(proxy, domain), reverse=True)
+        return random.choice(candidates[: self.top_k])
+
+    def save(self):
+        if not self.state_path:
+            return
+
+        folder = os.path.dirname(self.state_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        with open(self.state_path, "w", encoding="utf-8") as file:
+            json.dump(self.proxies, file)
+
+
+def probe_proxy(proxy, target_url, timeout):
+    """Fetch ``target_url`` through ``proxy``; return the latency or None on failure."""
+    proxy_url = f"http://{proxy}"
+    opener = urllib.request.build_opener(
+        urllib.request.ProxyHandler({"http": proxy_url, "https": proxy_url})
+    )
+    start = time.monotonic()
+    try:
+        with opener.open(target_url, timeout=timeout) as response:
+            response.read(1024)
+            if response.status >= 400:
+                return None
+    except Exception:
+        return None
+    return time.monotonic() - start
+
+
+def probe_proxies(pool, target_url, timeout=5, workers=32):
+    """Probe every non-quarantined proxy in parallel and record the results.
+
+    ``target_url`` can point at a local server, which is how the pool is
+    exercised without touching the real sites.
+    """
+    domain = urlparse(target_url).hostname
+    proxies = pool.available()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = executor.map(
+            lambda proxy: probe_proxy(proxy, target_url, timeout), proxies
+        )
+        for proxy, latency in zip(proxies, latencies):
+            if latency is None:
+                pool.record_failure(proxy, domain)
+            else:
+                pool.record_success(proxy, domain, latency)
+
+    alive = len(pool.available())
+    print(f"Probed {len(proxies)} proxies through {target_url}: {alive} available")
+    return alive
@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import zlib
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from twisted.internet import defer
+
+
+class FixtureArchive:
+    """Compact on-disk store of HTTP responses keyed by URL.
+
+    Bodies are zlib-compressed and kept with their status and headers in a
+    single SQLite file, so a recorded crawl can be copied around and
+    replayed offline.
+    """
+
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    def put(self, url, status, headers, body):
+        self.conn.execute(
+            """INSERT OR REPLACE INTO responses (url, status, headers, body)
+               VALUES (?, ?, ?, ?)""",
+            (url, status, json.dumps(headers), zlib.compress(body)),
+        )
+
+    def get(self, url):
+        row = self.conn.execute(
+            "SELECT status, headers, body FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        status, headers, body = row
+        return status, json.loads(headers), zlib.decompress(body)
+
+    def __iter__(self):
+        for url, status, headers, body in self.conn.execute(
+            "SELECT url, status, headers, body FROM responses ORDER BY url"
+        ):
+            yield url, status, json.loads(headers), zlib.decompress(body)
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def encode_headers(headers):
+    return {
+        key.decode("latin-1"): [value.decode("latin-1") for value in values]
+        for key, values in headers.items()
+    }
+
+
+def build_response(url, status, headers, body, request=None):
+    headers = Headers(headers)
+    response_class = responsetypes.from_args(headers=headers, url=url, body=body)
+    return response_class(
+        url=url, status=status, headers=headers, body=body, request=request
+    )
+
+
+class ReplayDownloadHandler:
+    """Download handler that answers every request from a FixtureArchive.
+
+    Install it for http and https through ``DOWNLOAD_HANDLERS`` and point
+    ``FIXTURE_ARCHIVE`` at a recorded archive. URLs missing from the
+    archive get an empty 404, so the crawl runs offline and at full speed.
+    """
+
+    lazy = False
+
+    def __init__(self, settings, crawler=None):
+        self.archive = FixtureArchive(settings.get("FIXTURE_ARCHIVE"))
+        self.stats = crawler.stats if crawler else None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings, crawler)
+
+    def download_request(self, request, spider):
+        record = self.archive.get(request.url)
+        if record is None:
+            if self.stats:
+                self.stats.inc_value("replay/missing")
+            return defer.succeed(build_response(request.url, 404, {}, b"", request))
+
+        if self.stats:
+            self.stats.inc_value("replay/served")
+        status, headers, body = record
+        response = build_response(request.url, status, headers, body, request)
+        return defer.succeed(response)
+
+    def close(self):
+        self.archive.close()
@@ -0,0 +1,273 @@
+"""Crawl cycle shared by main.py and app.py.
+
+``run_spider`` runs in a child process: it opens or resumes a CrawlJob,
+builds the Scrapy settings from config.json and crawls, sharded across
+processes when ``crawl_workers`` > 1. ``run_spider_in_process`` starts it,
+resumes once if it did not finish, and sends the output through
+categorization, clustering, summarization and the database.
+"""
+
+import glob
+import json
+import os
+import shutil
+from multiprocessing import Process, Queue
+
+from scrapy.crawler import CrawlerProcess
+
+from utills import (
+    add_id_to_grouped_articles,
+    assign_category,
+    assign_week_label,
+    cluster_articles,
+    insert_data,
+    read_records,
+    remove_duplicates_by_title,
+    summarize_articles,
+    truncate_partial_line,
+)
+
+from .frontier import SeenUrlStore
+from .jobs import CrawlJob
+from .spiders.spider import Spider
+from .workers import run_sharded_crawl, shard_path
+
+
+def output_files(scrapy_settings):
+    """Every file a crawl with ``scrapy_settings`` writes, with per-source shards."""
+    paths = list(scrapy_settings["FEEDS"])
+    if scrapy_settings.get("STREAMING_OUTPUT"):
+        paths.append(scrapy_settings["STREAMING_OUTPUT"])
+    files = []
+    for path in paths:
+        files.append(path)
+        files.extend(shard_path(path, source) for source in Spider.start_urls)
+    return files
+
+
+def mark_written_articles_seen(paths):
+    """Mark every article already in ``paths`` as seen, so it is not fetched again."""
+    seen_urls = SeenUrlStore(
+        Spider.seen_urls_location,
+        ttl_hours=Spider.seen_urls_ttl_hours,
+        empty_ttl_hours=Spider.seen_urls_empty_ttl_hours,
+    )
+    count = 0
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        for article in read_records(path):
+            if article.get("url"):
+                seen_urls.mark_exported(article["url"])
+                count += 1
+    seen_urls.close()
+    print(f"{count} article(s) already written by the resumed job")
+
+
+def prepare_resume(job, scrapy_settings, output_filename, interrupted, fixture_mode):
+    """Make the files and crawl state of an unfinished job safe to continue."""
+    # a killed crawl can leave a torn last line in its outputs
+    for path in output_files(scrapy_settings):
+        truncate_partial_line(path)
+
+    # Scrapy only saves its request queue on a graceful close ("interrupted");
+    # after a kill the fingerprints it did write would filter out the very
+    # listings that lead to the missing articles, so start over from the
+    # homepages and let the seen-url store skip what is already written
+    if not interrupted:
+        for folder in [job.crawl_folder] + glob.glob(job.crawl_folder + "_*"):
+            shutil.rmtree(folder, ignore_errors=True)
+
+    if fixture_mode not in ("record", "replay"):
+        mark_written_articles_seen(
+            [output_filename]
+            + [shard_path(output_filename, source) for source in Spider.start_urls]
+        )
+
+
+def run_spider(queue, resume=False):
+    """Runs the Scrapy spider and sends the output filename via queue."""
+    job = None
+    try:
+        with open("config.json", "r", encoding="utf-8") as file:
+            config = json.load(file)
+
+        use_proxies = config.get("use_proxies", "False").lower() == "true"
+        stream_processing = (
+            config.get("stream_processing", "False").lower() == "true"
+        )
+        fixture_mode = config.get("fixture_mode", "off").lower()
+        crawl_workers = int(config.get("crawl_workers", 1))
+
+        # crawl state is checkpointed to a job folder; resuming reuses the
+        # job's file names and settings so its partial output is appended to
+        job = CrawlJob.last_incomplete() if resume else None
+        resumed = job is not None
+        interrupted = resumed and job.info.get("status") == "interrupted"
+        if job:
+            print(f"Resuming crawl job '{job.folder}'")
+            stream_processing = job.info.get("stream_processing", stream_processing)
+            crawl_workers = job.info.get("crawl_workers", crawl_workers)
+            job.update(status="running", resumes=job.info.get("resumes", 0) + 1)
+        else:
+            job = CrawlJob.create()
+            job.update(stream_processing=stream_processing, crawl_workers=crawl_workers)
+
+        timestamp = job.timestamp
+        output_filename = f"results/raw_articles/scraped_results_{timestamp}.jsonl"
+
+        scrapy_settings = {
+            "FEEDS": {
+                output_filename: {
+                    "format": "jsonlines",
+                    "encoding": "utf8",
+                    "ensure_ascii": False,
+                },
+            },
+            "JOBDIR": job.crawl_folder,
+        }
+
+        # label, de-duplicate and categorize items while the crawl runs
+        if stream_processing:
+            processed_filename = (
+                f"results/raw_articles/processed_results_{timestamp}.jsonl"
+            )
+            scrapy_settings.update(
+                {
+                    "ITEM_PIPELINES": {
+                        "scraper.scraper.pipelines.StreamingPipeline": 300,
+                    },
+                    "STREAMING_OUTPUT": processed_filename,
+                }
+            )
+            output_filename = processed_filename
+
+        if use_proxies:
+            scrapy_settings.update(
+                {
+                    "DOWNLOADER_MIDDLEWARES": {
+                        "scraper.scraper.middlewares.ProxyPoolMiddleware": 610,
+                    },
+                    "PROXY_POOL_LIST_PATH": "proxies.txt",
+                    "PROXY_POOL_STATE_PATH": config.get(
+                        "proxy_pool_state_location", "proxy_scores.json"
+                    ),
+                    "PROXY_POOL_PROBE_URL": config.get("proxy_pool_probe_url"),
+                }
+            )
+
+        # record the live crawl to, or serve it back from, a fixture archive
+        if fixture_mode == "record":
+            scrapy_settings.setdefault("DOWNLOADER_MIDDLEWARES", {})[
+                "scraper.scraper.middlewares.FixtureRecorderMiddleware"
+            ] = 960
+        elif fixture_mode == "replay":
+            scrapy_settings["DOWNLOAD_HANDLERS"] = {
+                "http": "scraper.scraper.replay.ReplayDownloadHandler",
+                "https": "scraper.scraper.replay.ReplayDownloadHandler",
+            }
+        if fixture_mode in ("record", "replay"):
+            scrapy_settings["FIXTURE_MODE"] = fixture_mode
+            scrapy_settings["FIXTURE_ARCHIVE"] = config.get(
+                "fixture_archive", "fixtures.db"
+            )
+
+        if resumed:
+            prepare_resume(
+                job, scrapy_settings, output_filename, interrupted, fixture_mode
+            )
+            # feeds and sitemaps the killed run found unchanged are read again
+            scrapy_settings["CONDITIONAL_REQUESTS_ENABLED"] = False
+
+        if crawl_workers > 1:
+            # one worker process per source; per-article stages run on each
+            # source's shard as soon as it lands
+            def process_shard(source, shard):
+                if not stream_processing and os.path.exists(shard):
+                    assign_category(assign_week_label(shard))
+                job.append("completed_sources", source)
+
+            _, failed = run_sharded_crawl(
+                scrapy_settings,
+                output_filename,
+                crawl_workers,
+                spider_kwargs={"fixture_mode": fixture_mode},
+                on_shard_done=process_shard,
+                sources=[
+                    source
+                    for source in Spider.start_urls
+                    if source not in job.info.get("completed_sources", [])
+                ],
+            )
+            # shards are only de-duplicated within one source
+            output_filename = remove_duplicates_by_title(output_filename)
+            if failed:
+                # resuming the job re-crawls only the sources that failed
+                job.update(status="failed", failed_sources=failed)
+                queue.put((None, False))
+                return
+            job.update(status="done", output_filename=output_filename)
+            queue.put((output_filename, True))
+            return
+
+        process = CrawlerProcess(scrapy_settings)
+        crawler = process.create_crawler(Spider)
+        process.crawl(crawler, fixture_mode=fixture_mode)
+        process.start()
+
+        reason = crawler.stats.get_value("finish_reason")
+        if reason != "finished":
+            # e.g. "shutdown": Scrapy saved the queue to JOBDIR, so resuming
+            # continues it instead of starting over
+            job.update(status="interrupted", finish_reason=reason)
+            queue.put((None, False))
+            return
+
+        job.update(status="done", output_filename=output_filename)
+        queue.put((output_filename, stream_processing))
+
+    except Exception as e:
+        print(f"Error running spider: {e}")
+        if job:
+            job.update(status="failed")
+        queue.put((None, False))
+
+
+def run_spider_in_process(resume=False):
+    """Crawl in a separate process, then run the article pipeline on the output.
+
+    Returns the summarized file that was inserted, or None if the crawl failed.
+    """
+    queue = Queue()
+    p = Process(target=run_spider, args=(queue, resume))
+    p.start()
+    p.join()
+
+    # a spider process killed outright (OOM, webdriver crash) never reports back
+    scraped_result_json, already_processed = (
+        queue.get() if p.exitcode == 0 else (None, False)
+    )
+    if not scraped_result_json and not resume:
+        print("Crawl did not finish, resuming it from its checkpoint.")
+        return run_spider_in_process(resume=True)
+
+    if scraped_result_json:
+        print("Scraped file location:", scraped_result_json)
+        if not already_processed:
+            scraped_result_json = assign_week_label(scraped_result_json)
+            scraped_result_json = assign_category(scraped_result_json)
+            scraped_result_json = remove_duplicates_by_title(scraped_result_json)
+
+        clustered_json = cluster_articles(
+            scraped_result_json, "results/clusterd_articles"
+        )
+        clustered_json = add_id_to_grouped_articles(clustered_json)
+
+        summerized_json = summarize_articles(
+            clustered_json, "results/summarized_articles"
+        )
+        insert_data(summerized_json)
+        return summerized_json
+
+    print("Failed to scrape articles.")
+    return None
@@ -25,7 +25,9 @@ ROBOTSTXT_OBEY = False
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
-DOWNLOAD_DELAY = 2
+# The spider tunes delay and concurrency per domain (AdaptiveThrottleMiddleware),
+# configured with the "throttle" entry of each source in config.json
+# DOWNLOAD_DELAY = 2
 # The download delay setting will honor only one of:
 # CONCURRENT_REQUESTS_PER_DOMAIN = 16
 # CONCURRENT_REQUESTS_PER_IP = 16
@@ -55,11 +57,11 @@ DOWNLOAD_DELAY = 2
 # }
 # **************************************************************************************
 # DOWNLOADER_MIDDLEWARES = {
-#     "rotating_proxies.middlewares.RotatingProxyMiddleware": 610,
-#     "rotating_proxies.middlewares.BanDetectionMiddleware": 620,
+#     "scraper.middlewares.ProxyPoolMiddleware": 610,
 # }
 
-# ROTATING_PROXY_LIST_PATH = "proxies.txt"
+# PROXY_POOL_LIST_PATH = "proxies.txt"
+# PROXY_POOL_STATE_PATH = "proxy_scores.json"
 # ***********************************************************************************
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -0,0 +1,177 @@
+import copy
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import wait
+from urllib.parse import urlparse
+
+from scrapy.crawler import CrawlerProcess
+
+from utills.jsonl import truncate_partial_line
+
+from .spiders.spider import Spider
+
+
+def shard_path(path, source):
+    root, ext = os.path.splitext(path)
+    return f"{root}_{urlparse(source).hostname}{ext}"
+
+
+def shard_settings(scrapy_settings, source):
+    """Copy of ``scrapy_settings`` with every output file renamed for ``source``."""
+    settings = copy.deepcopy(scrapy_settings)
+    settings["FEEDS"] = {
+        shard_path(path, source): options
+        for path, options in scrapy_settings.get("FEEDS", {}).items()
+    }
+    if settings.get("STREAMING_OUTPUT"):
+        settings["STREAMING_OUTPUT"] = shard_path(settings["STREAMING_OUTPUT"], source)
+    if settings.get("JOBDIR"):
+        settings["JOBDIR"] = shard_path(settings["JOBDIR"], source)
+    return settings
+
+
+def crawl_shard(task, connection):
+    """Worker process body: crawl a single source with its own reactor.
+
+    The error message, or None, is sent back through ``connection``.
+    """
+    source, settings, spider_kwargs = task
+    try:
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler(Spider)
+        process.crawl(crawler, sources=[source], **spider_kwargs)
+        process.start()
+        reason = crawler.stats.get_value("finish_reason")
+        # e.g. "shutdown": the queue was saved to JOBDIR but did not drain
+        error = None if reason == "finished" else f"crawl closed: {reason}"
+    except Exception as e:
+        error = str(e)
+    connection.send(error)
+    connection.close()
+
+
+def start_shard(task):
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=crawl_shard, args=(task, sender))
+    process.start()
+    sender.close()
+    return process, receiver, time.monotonic()
+
+
+def finish_shard(process, receiver):
+    """Join a finished worker; returns its error message or None."""
+    process.join()
+    try:
+        error = receiver.recv()
+    except EOFError:
+        error = None
+    receiver.close()
+    if process.exitcode != 0:
+        # killed (e.g. by the OOM killer) or crashed before reporting
+        error = error or f"worker exited with code {process.exitcode}"
+    return error
+
+
+def merge_shards(path, sources):
+    """Concatenate the JSON Lines shards of ``path`` into ``path`` itself."""
+    with open(path, "a", encoding="utf-8") as merged:
+        for source in sources:
+            shard = shard_path(path, source)
+            if not os.path.exists(shard):
+                continue
+            # a worker killed mid-write leaves a torn last line
+            truncate_partial_line(shard)
+            with open(shard, "r", encoding="utf-8") as file:
+                for line in file:
+                    merged.write(line)
+            os.remove(shard)
+    return path
+
+
+def run_sharded_crawl(
+    scrapy_settings,
+    output_filename,
+    workers,
+    spider_kwargs=None,
+    on_shard_done=None,
+    sources=None,
+):
+    """Crawl every source in its own worker process and merge the outputs.
+
+    Sources run on a pool of ``workers`` processes; each writes its own
+    shard of every output file. ``on_shard_done(source, shard)`` is called
+    as soon as a source finishes, with the shard of ``output_filename``
+    (which does not exist if the source produced no items), so per-article
+    stages can start before the slowest site is done. Callbacks run on
+    threads, so a slow one never holds back the next crawl; a callback that
+    raises fails its source. Returns
+    the per-source crawl time in seconds and a dict of the sources that
+    failed, with their error, including workers that died.
+
+    ``sources`` limits which sources are crawled (e.g. the ones a resumed
+    job has not finished); shards of every source are still merged.
+    """
+    spider_kwargs = spider_kwargs or {}
+    all_sources = list(Spider.start_urls)
+    if sources is None:
+        sources = all_sources
+    tasks = [
+        (source, shard_settings(scrapy_settings, source), spider_kwargs)
+        for source in sources
+    ]
+
+    timings = {}
+    failed = {}
+    running = {}
+    callbacks = ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="shard-done"
+    )
+    pending_callbacks = {}
+    # one process per source so every crawl gets a fresh twisted reactor, and
+    # a worker that dies only fails its own source
+    while tasks or running:
+        while tasks and len(running) < workers:
+            task = tasks.pop(0)
+            running[task[0]] = start_shard(task)
+
+        sentinels = {
+            process.sentinel: source for source, (process, _, _) in running.items()
+        }
+        for sentinel in wait(list(sentinels)):
+            source = sentinels[sentinel]
+            process, receiver, start = running.pop(source)
+            error = finish_shard(process, receiver)
+            seconds = time.monotonic() - start
+            timings[source] = round(seconds, 1)
+            if error:
+                print(f"Error crawling {source}: {error}")
+                failed[source] = error
+                continue
+
+            print(f"Crawled {source} in {seconds:.1f}s")
+            if on_shard_done:
+                pending_callbacks[source] = callbacks.submit(
+                    on_shard_done, source, shard_path(output_filename, source)
+                )
+
+    # shards are merged only once every callback is done rewriting them
+    for source, future in pending_callbacks.items():
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Error processing {source}: {e}")
+            failed[source] = str(e)
+    callbacks.shutdown()
+
+    output_paths = list(scrapy_settings.get("FEEDS", {}))
+    if scrapy_settings.get("STREAMING_OUTPUT"):
+        output_paths.append(scrapy_settings["STREAMING_OUTPUT"])
+    for path in output_paths:
+        merge_shards(path, all_sources)
+
+    for source, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+        print(f"{seconds:>8.1f}s  {source}")
+
+    return timings, failed
@@ -0,0 +1,82 @@
+import http.server
+import socket
+import threading
+import time
+import unittest
+
+from scraper.scraper.proxy_pool import ProxyPool, probe_proxies
+
+# never resolved: the local proxy answers for it without going anywhere
+TARGET_URL = "http://proxy-probe.invalid/"
+
+
+class ForwardProxyHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def dead_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ProxyPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), ForwardProxyHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.live = f"127.0.0.1:{self.server.server_address[1]}"
+        self.dead = f"127.0.0.1:{dead_port()}"
+        self.pool = ProxyPool([self.live, self.dead], base_backoff=60)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_probe_quarantines_dead_proxy(self):
+        alive = probe_proxies(self.pool, TARGET_URL, timeout=2)
+
+        self.assertEqual(alive, 1)
+        self.assertEqual(self.pool.available(), [self.live])
+
+        live = self.pool.proxies[self.live]
+        self.assertEqual(live["failures"], 0)
+        self.assertGreater(live["success"], 0.5)
+        self.assertIn("proxy-probe.invalid", live["domains"])
+
+        dead = self.pool.proxies[self.dead]
+        self.assertEqual(dead["failures"], 1)
+        self.assertLess(dead["success"], 0.5)
+        self.assertAlmostEqual(dead["quarantined_until"], time.time() + 60, delta=5)
+
+    def test_choose_only_returns_available_proxies(self):
+        probe_proxies(self.pool, TARGET_URL, timeout=2)
+
+        for _ in range(20):
+            self.assertEqual(self.pool.choose("proxy-probe.invalid"), self.live)
+
+        self.pool.record_failure(self.live, "proxy-probe.invalid", banned=True)
+        self.assertIsNone(self.pool.choose("proxy-probe.invalid"))
+        self.assertEqual(self.pool.proxies[self.live]["bans"], 1)
+
+    def test_quarantine_backs_off_exponentially(self):
+        for failures in range(1, 4):
+            self.pool.record_failure(self.dead, "example.com")
+            backoff = self.pool.proxies[self.dead]["quarantined_until"] - time.time()
+            self.assertAlmostEqual(backoff, 60 * 2 ** (failures - 1), delta=5)
+
+        self.pool.record_success(self.dead, "example.com", 0.2)
+        self.assertIn(self.dead, self.pool.available())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import glob
+import http.server
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECTIONS = 5
+ARTICLES_PER_SECTION = 20
+ARTICLES = SECTIONS * ARTICLES_PER_SECTION
+KILL_AFTER_ITEMS = 13
+
+CRAWL = """
+import multiprocessing
+from scraper.scraper.runner import run_spider
+
+queue = multiprocessing.Queue()
+run_spider(queue, resume={resume})
+print("RESULT", queue.get())
+"""
+
+
+class NewsSiteHandler(http.server.BaseHTTPRequestHandler):
+    """Homepage -> section listings -> articles, like the real sources."""
+
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+
+        parts = self.path.strip("/").split("/")
+        if self.path == "/":
+            links = [f"/section/{number}" for number in range(1, SECTIONS + 1)]
+            body = self.links_page(links)
+        elif parts[0] == "section" and len(parts) == 2:
+            first = (int(parts[1]) - 1) * ARTICLES_PER_SECTION + 1
+            links = [
+                f"/news/{number}"
+                for number in range(first, first + ARTICLES_PER_SECTION)
+            ]
+            body = self.links_page(links)
+        elif parts[0] == "news" and len(parts) == 2:
+            time.sleep(0.05)
+            body = self.article_page(int(parts[1]))
+        else:
+            self.send_error(404)
+            return
+
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def links_page(links):
+        anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+        return f"<html><body>{anchors}</body></html>"
+
+    @staticmethod
+    def article_page(number):
+        published = datetime.now(timezone.utc).isoformat()
+        paragraphs = "".join(f"<p>Story {number}, paragraph {i}.</p>" for i in range(40))
+        return f"""<html><body><article class="news">
+            <h1 class="news-heading">Story number {number}</h1>
+            <img src="/images/{number}.jpg">
+            <p class="news-datestamp">{published}</p>
+            <div class="news-content">{paragraphs}</div>
+        </article></body></html>"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ResumeAfterKillTest(unittest.TestCase):
+    def setUp(self):
+        NewsSiteHandler.hits = {}
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), NewsSiteHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.site = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.write_config()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.folder.cleanup()
+
+    def write_config(self):
+        folder = self.folder.name
+        config = {
+            "use_proxies": "False",
+            "stream_processing": "False",
+            "crawl_workers": 1,
+            "news_time_difference_in_hours": 8,
+            "drop_stale_articles": "False",
+            "main_links_save_location": os.path.join(folder, "main_links.txt"),
+            "sub_links_save_locattion": os.path.join(folder, "article_links.txt"),
+            "seen_urls_location": os.path.join(folder, "seen_urls.db"),
+            "conditional_cache_location": os.path.join(folder, "validators.db"),
+            "parsing_rules": {
+                self.site: {
+                    "title": "h1.news-heading::text",
+                    "content": "div.news-content p::text",
+                    "date": "p.news-datestamp::text",
+                    "date_formats": ["iso"],
+                    "cover_image": "article.news img::attr(src)",
+                    "allowed_domains": ["127.0.0.1"],
+                    "article_url_pattern": "/news/\\d+$",
+                    "throttle": {
+                        "start_delay": 0.02,
+                        "start_concurrency": 1,
+                        "max_concurrency": 2,
+                    },
+                }
+            },
+        }
+        with open(os.path.join(folder, "config.json"), "w", encoding="utf-8") as file:
+            json.dump(config, file)
+
+    def start_crawl(self, resume):
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+        return subprocess.Popen(
+            [sys.executable, "-c", CRAWL.format(resume=resume)],
+            cwd=self.folder.name,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+
+    def output_records(self):
+        paths = glob.glob(
+            os.path.join(self.folder.name, "results", "raw_articles", "*.jsonl")
+        )
+        records = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as file:
+                records.extend(line for line in file if line.endswith("\n"))
+        return [json.loads(record) for record in records]
+
+    def article_hits(self):
+        return {
+            path: count
+            for path, count in NewsSiteHandler.hits.items()
+            if path.startswith("/news/")
+        }
+
+    def test_resume_after_kill_recovers_every_article(self):
+        crawl = self.start_crawl(resume=False)
+        deadline = time.monotonic() + 120
+        while len(self.output_records()) < KILL_AFTER_ITEMS:
+            self.assertIsNone(crawl.poll(), "the crawl finished before it was killed")
+            self.assertLess(time.monotonic(), deadline, "the crawl made no progress")
+            time.sleep(0.05)
+        crawl.kill()
+        crawl.wait()
+
+        written = {record["url"] for record in self.output_records()}
+        self.assertLess(len(written), ARTICLES)
+        hits_before = self.article_hits()
+
+        resumed = self.start_crawl(resume=True)
+        output, _ = resumed.communicate(timeout=300)
+        self.assertEqual(resumed.returncode, 0, output)
+
+        urls = [record["url"] for record in self.output_records()]
+        self.assertEqual(len(set(urls)), ARTICLES, output)
+
+        # articles already written before the kill are not fetched again
+        hits_after = self.article_hits()
+        for url in written:
+            path = "/" + url.split("/", 3)[3]
+            self.assertEqual(hits_after[path], hits_before[path], path)
+
+        (job_path,) = glob.glob(
+            os.path.join(self.folder.name, "results", "jobs", "*", "job.json")
+        )
+        with open(job_path, "r", encoding="utf-8") as file:
+            job = json.load(file)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["resumes"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
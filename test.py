@@ -25,7 +25,9 @@ from datetime import datetime
 
 
 def process_all_json_files(input_directory):
-    json_files = glob.glob(os.path.join(input_directory, "*.json"))
+    json_files = glob.glob(os.path.join(input_directory, "*.json")) + glob.glob(
+        os.path.join(input_directory, "*.jsonl")
+    )
 
     for file_path in json_files:
         print(f"Processing: {file_path}")
@@ -1,9 +1,18 @@
+from .jsonl import read_records, write_records, RecordWriter, truncate_partial_line
+from .ids import article_id, canonical_url, content_hash
+from .tokens import estimate_tokens, pack_texts, truncate_to_tokens
 from .summarize import summarize_articles, create_feature_article
 from .cluster import extract_titles, cluster_titles, cluster_articles
-from .categorized import assign_category, select_articles_category_wise
+from .categorized import (
+    assign_category,
+    generate_categories,
+    generate_category,
+    select_articles_category_wise,
+)
 from .mongo_db import *
 from .post_process import (
     remove_duplicates_by_title,
     add_id_to_grouped_articles,
     assign_week_label,
+    get_week_label,
 )
@@ -1,73 +1,173 @@
 import json
 import os
-from dotenv import load_dotenv
-import openai
 from tqdm import tqdm
+from .jsonl import read_records, write_records
+from .llm import chat, concurrent_map, get_executor
+from .tokens import truncate_to_tokens
+
+
+CATEGORIES = [
+    "Business",
+    "Entertainment",
+    "General",
+    "Health",
+    "Science",
+    "Sports",
+    "Technology",
+    "Politics",
+]
+FALLBACK_CATEGORY = "General"
+PROMPT_VERSION = "categories-1"
+
+
+def normalize_category(label):
+    """Map a model label onto one of CATEGORIES, or None if it is not one."""
+    if not isinstance(label, str):
+        return None
+    label = label.strip().strip(".\"'").lower()
+    for category in CATEGORIES:
+        if label == category.lower():
+            return category
+    return None
+
+
+def classify_batch(texts, refresh_cache=False):
+    """Classify a few articles in one request; returns {key: category} for the valid answers."""
+    articles = "\n\n".join(f"[{key}]\n{text}" for key, text in texts.items())
+    prompt = f"""Classify each of the following Sinhala news articles into exactly one of these categories:
+    {", ".join(CATEGORIES)}.
+
+    Each article starts with its key in square brackets. Respond with a JSON object
+    mapping every key to its category name, e.g. {{"1": "Sports", "2": "Politics"}}.
+    Do not include any additional text.
+
+    {articles}
+    """
+
+    reply = chat(
+        prompt,
+        temperature=0,
+        expected_output_tokens=12 * len(texts),
+        prompt_version=PROMPT_VERSION,
+        refresh_cache=refresh_cache,
+        response_format={"type": "json_object"},
+    )
 
+    try:
+        labels = json.loads(reply)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    if not isinstance(labels, dict):
+        return {}
 
-load_dotenv()
-deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-
-
-client = openai.OpenAI(api_key=deepseek_api_key, base_url="https://api.deepseek.com/v1")
+    categories = {}
+    for key, label in labels.items():
+        category = normalize_category(label)
+        if str(key) in texts and category:
+            categories[str(key)] = category
+    return categories
 
 
-def generate_category(text):
-    """Use DeepSeek API to generate a professional news lead for an article or a group of articles."""
+def classify_batch_safely(texts, refresh_cache=False):
     try:
-        prompt = f"""Analyze the following Sinhala news content and classify it into one of these categories: 
-        Business, Entertainment, General, Health, Science, Sports, Technology, or Politics.
-        
-        Only respond with the category name. Do not include any additional text.
-        
-        Sinhala news content: {text}
-        """
-
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
+        return classify_batch(texts, refresh_cache=refresh_cache)
+    except Exception as e:
+        print(f"Error generating categories: {e}")
+        return {}
+
+
+def generate_categories(texts, batch_size=20, max_tokens_per_article=256, retries=2):
+    """Classify many articles with a few batched requests.
+
+    ``texts`` maps an article key to its content. Each article is cut to its
+    leading ``max_tokens_per_article`` tokens and up to ``batch_size`` of
+    them share one request. Articles whose answer is missing or not one of
+    CATEGORIES are retried, on their own batches, up to ``retries`` more
+    times before falling back to FALLBACK_CATEGORY.
+    """
+    # short numeric keys keep the prompt and the reply small
+    keys = {str(number): key for number, key in enumerate(texts, start=1)}
+    pending = {
+        number: truncate_to_tokens(texts[key], max_tokens_per_article)
+        for number, key in keys.items()
+    }
+    categories = {}
+
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+
+        numbers = list(pending)
+        batches = [
+            {number: pending[number] for number in numbers[start : start + batch_size]}
+            for start in range(0, len(numbers), batch_size)
+        ]
+        # the batches of one round run concurrently on the shared LLM pool
+        # a retry must not be answered with the cached reply that just failed
+        for result in concurrent_map(
+            lambda batch: classify_batch_safely(batch, refresh_cache=attempt > 0),
+            batches,
+        ):
+            categories.update(result)
+
+        pending = {
+            number: text for number, text in pending.items() if number not in categories
+        }
+
+    if pending:
+        print(
+            f"Could not classify {len(pending)} article(s); using '{FALLBACK_CATEGORY}'."
         )
 
-        return response.choices[0].message.content
+    return {
+        key: categories.get(number, FALLBACK_CATEGORY) for number, key in keys.items()
+    }
 
-    except Exception as e:
-        print(f"Error generating news lead: {e}")
-        return "News category not available due to an error."
+
+def generate_category(text):
+    """Classify a single Sinhala article into one of CATEGORIES."""
+    return generate_categories({"article": text})["article"]
 
 
-def assign_category(json_file_path):
+def assign_category(json_file_path, batch_size=20, max_tokens_per_article=256):
     try:
         if not os.path.exists(json_file_path):
             raise FileNotFoundError(f"File '{json_file_path}' does not exist.")
 
-        # Load JSON file
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            try:
-                articles = json.load(file)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON format: {e}")
-
-        if not isinstance(articles, list):
-            raise ValueError("The JSON file must contain a list of articles.")
-
-        # Process each article with progress bar
-        with tqdm(
-            total=len(articles), desc="Assigning categories", unit="article"
-        ) as pbar:
-            for article in articles:
-                try:
-                    category = generate_category(article["content"])
-                    article["category"] = category
-                except KeyError as ke:
-                    print(f"Missing key in article data: {ke}")
-                except Exception as e:
-                    print(f"Error processing article: {e}")
-                pbar.update(1)
-
-        # Save the updated articles back to the same JSON file
-        with open(json_file_path, "w", encoding="utf-8") as file:
-            json.dump(articles, file, ensure_ascii=False, indent=4)
+        def categorize(chunk):
+            texts = {
+                index: article["content"]
+                for index, article in enumerate(chunk)
+                if "content" in article
+            }
+            categories = generate_categories(
+                texts,
+                batch_size=batch_size,
+                max_tokens_per_article=max_tokens_per_article,
+            )
+            for index, article in enumerate(chunk):
+                if index in categories:
+                    article["category"] = categories[index]
+                else:
+                    print("Missing key in article data: 'content'")
+            return chunk
+
+        # enough articles per chunk to keep every LLM worker busy
+        chunk_size = batch_size * get_executor().max_concurrency
+
+        def categorized_articles():
+            chunk = []
+            for article in tqdm(
+                read_records(json_file_path), desc="Assigning categories", unit="article"
+            ):
+                chunk.append(article)
+                if len(chunk) >= chunk_size:
+                    yield from categorize(chunk)
+                    chunk = []
+            yield from categorize(chunk)
+
+        # Save the updated articles back to the same file
+        write_records(json_file_path, categorized_articles())
 
         print(f"Final processed news data saved to '{json_file_path}'")
         return json_file_path
@@ -96,17 +196,7 @@ def select_articles_category_wise(json_file_path):
         if not os.path.exists(json_file_path):
             raise FileNotFoundError(f"File '{json_file_path}' does not exist.")
 
-        # Load JSON file
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            try:
-                articles = json.load(file)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON format: {e}")
-
-        if not isinstance(articles, list):
-            raise ValueError("The JSON file must contain a list of articles.")
-
-        for article in articles:
+        for article in read_records(json_file_path):
             articles_dict[article["category"]].append(article["long_summary"])
 
         return articles_dict
@@ -1,33 +1,28 @@
-import json
 import os
 import datetime
-from dotenv import load_dotenv
-import openai
 import re
 import unicodedata
-
-load_dotenv()
-deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-
-client = openai.OpenAI(api_key=deepseek_api_key, base_url="https://api.deepseek.com/v1")
+from .jsonl import RecordWriter, read_records
+from .llm import chat
+from .title_clustering import group_titles
 
 
 def extract_titles(results_json_file_location):
-    with open(results_json_file_location, "r", encoding="utf-8") as file:
-        all_articles = json.load(file)
     titles = []
+    seen_titles = set()
 
-    for article in all_articles:
-        if article["title"] not in titles:
+    for article in read_records(results_json_file_location):
+        if article["title"] not in seen_titles:
+            seen_titles.add(article["title"])
             titles.append(article["title"])
 
     # print(titles)
 
-    return titles, all_articles
+    return titles
 
 
 def cluster_titles(results_json_file_location):
-    titles, all_articles = extract_titles(results_json_file_location)
+    titles = extract_titles(results_json_file_location)
     # unique_articles = remove_duplicates_by_title(all_articles)
     print(f"Extracted titles = {titles}\n\n\n")
 
@@ -58,16 +53,11 @@ Return ONLY a valid Python list in which include classification details of title
 
 """
 
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-    )
+    # the reply repeats every title, so it is about as long as the prompt
+    reply = chat(prompt, temperature=0.7, expected_output_tokens=len(prompt) // 2)
 
-    print(
-        f"{response.choices[0].message.content} ********************************************"
-    )
-    return response.choices[0].message.content, all_articles
+    print(f"{reply} ********************************************")
+    return reply
 
 
 import re
@@ -91,6 +81,18 @@ def clean_title(title):
     return title
 
 
+def normalize_title(title):
+    # unlike clean_title, Latin letters and digits (names, scores, years)
+    # are kept, so titles that differ only there are not treated as equal
+    title = unicodedata.normalize("NFKC", title).casefold()
+    title = "".join(
+        c if c.isalnum() or "\u0D80" <= c <= "\u0DFF" else " "
+        for c in title
+        if unicodedata.category(c) not in ["Cf", "Cc"]
+    )
+    return re.sub(r"\s+", " ", title).strip()
+
+
 def convert_to_list(text):
     # Regex pattern to capture individual tuples as strings
 
@@ -103,16 +105,21 @@ def convert_to_list(text):
     return result
 
 
-def cluster_articles(results_json_file_location, output_folder):
-    # Create a dictionary to map titles to their group IDs
-    grouped_list, full_articles = cluster_titles(results_json_file_location)
+def llm_title_groups(results_json_file_location):
+    """Ask the LLM to group the titles; returns (title_to_group, grouped_dict)."""
+    grouped_list = cluster_titles(results_json_file_location)
     grouped_list = convert_to_list(grouped_list)
 
+    # the reply may not echo titles exactly; match it back to the raw titles
+    raw_titles = {}
+    for title in extract_titles(results_json_file_location):
+        raw_titles.setdefault(clean_title(title), []).append(title)
+
     title_to_group = {}
     for title, group in grouped_list:
         if group != "unique":
-            cleaned_title = clean_title(title)
-            title_to_group[cleaned_title] = group
+            for raw_title in raw_titles.get(clean_title(title), []):
+                title_to_group[raw_title] = group
 
     grouped_dict = {}
     for title, group in title_to_group.items():
@@ -122,35 +129,69 @@ def cluster_articles(results_json_file_location, output_folder):
                 "representative_title": title,
                 "articles": [],
             }
+    return title_to_group, grouped_dict
 
-    # Add articles to their respective groups
-    for article in full_articles:
-        title = clean_title(article["title"])
-        print(f"title = {title}")
-        print(f"tittle_to_group = {title_to_group}\n\n")
-        if title in title_to_group:
-            group = title_to_group[title]
 
-            grouped_dict[group]["articles"].append(article)
-        else:
-            grouped_dict[title] = article
+def local_title_groups(results_json_file_location, use_llm_for_borderline=False):
+    """Group the titles with local TF-IDF similarity; same return shape as llm_title_groups."""
+    titles = extract_titles(results_json_file_location)
+    normalized_titles = [normalize_title(title) for title in titles]
+    groups = group_titles(normalized_titles, use_llm=use_llm_for_borderline)
 
-    # Convert the dictionary to a list
-    result = []
+    title_to_group = {}
+    grouped_dict = {}
+    for number, members in enumerate(groups, start=1):
+        group = f"group_{number}"
+        for index in members:
+            title_to_group[titles[index]] = group
+        grouped_dict[group] = {
+            "group_id": group,
+            "representative_title": titles[members[0]],
+            "articles": [],
+        }
+
+    print(
+        f"Grouped {len(title_to_group)} of {len(titles)} titles "
+        f"into {len(groups)} groups"
+    )
+    return title_to_group, grouped_dict
+
+
+def cluster_articles(
+    results_json_file_location,
+    output_folder,
+    engine="local",
+    use_llm_for_borderline=False,
+):
+    """Group articles that report the same story.
+
+    ``engine`` "local" groups titles by character n-gram TF-IDF similarity,
+    optionally asking the LLM about borderline pairs only; "llm" sends all
+    titles to the LLM in one prompt as before.
+    """
+    if engine == "llm":
+        title_to_group, grouped_dict = llm_title_groups(results_json_file_location)
+    else:
+        title_to_group, grouped_dict = local_title_groups(
+            results_json_file_location, use_llm_for_borderline
+        )
 
-    for key, value in grouped_dict.items():
-        result.append(value)
-    # print(result)
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-    output_filename = f"clustered_articles_{timestamp}.json"
+    output_filename = f"clustered_articles_{timestamp}.jsonl"
     output_filepath = os.path.join(output_folder, output_filename)
 
-    # Ensure output folder exists
-    os.makedirs(output_folder, exist_ok=True)
-
-    # Save to JSON file
-    with open(output_filepath, "w", encoding="utf-8") as file:
-        json.dump(result, file, ensure_ascii=False, indent=4)
+    # Ungrouped articles are written straight through; only grouped ones
+    # are held until their group is complete
+    with RecordWriter(output_filepath) as writer:
+        for article in read_records(results_json_file_location):
+            if article["title"] in title_to_group:
+                group = title_to_group[article["title"]]
+                grouped_dict[group]["articles"].append(article)
+            else:
+                writer.write(article)
+
+        for group in grouped_dict.values():
+            writer.write(group)
 
     print(f"clusterd results is saved to = {output_filepath}")
 
@@ -0,0 +1,36 @@
+import hashlib
+import uuid
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from w3lib.url import canonicalize_url
+
+# query parameters that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref"}
+
+
+def canonical_url(url):
+    """Normalize ``url`` so every link to the same article compares equal.
+
+    The scheme and host are lower-cased, the fragment and tracking
+    parameters (``utm_*``, ``fbclid``, ...) are dropped, the remaining query
+    is sorted, and ``http`` is treated as ``https``.
+    """
+    parts = urlsplit(url.strip())
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    url = urlunsplit(("https", parts.netloc, parts.path, urlencode(query), ""))
+    return canonicalize_url(url)
+
+
+def article_id(url):
+    """Stable article id: the same URL gives the same id on every crawl."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, canonical_url(url)))
+
+
+def content_hash(title, content):
+    """SHA-1 of the whitespace-normalized title and body, to spot edited articles."""
+    text = " ".join((title or "").split()) + "\n" + " ".join((content or "").split())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,108 @@
+import json
+import os
+
+
+def read_records(file_path):
+    """Yield the records of a JSON Lines file one at a time.
+
+    Files written before the switch to JSON Lines hold a single JSON array;
+    those are detected by their first character and yielded item by item.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        first_char = file.read(1)
+        while first_char and first_char.isspace():
+            first_char = file.read(1)
+
+        if first_char == "[":
+            file.seek(0)
+            records = json.load(file)
+            if not isinstance(records, list):
+                raise ValueError("The JSON file must contain a list of articles.")
+            yield from records
+            return
+
+        file.seek(0)
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+
+
+def truncate_partial_line(file_path):
+    """Cut a torn last line off a JSON Lines file left by a killed writer.
+
+    Returns the number of bytes removed.
+    """
+    if not os.path.exists(file_path):
+        return 0
+
+    with open(file_path, "rb+") as file:
+        size = file.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            step = min(65536, end)
+            file.seek(end - step)
+            chunk = file.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                end = end - step + newline + 1
+                break
+            end -= step
+        if end < size:
+            file.truncate(end)
+        return size - end
+
+
+class RecordWriter:
+    """Write records to a JSON Lines file, one compact line per record.
+
+    With ``atomic=True`` the records go to a temporary file that replaces
+    ``file_path`` on a clean close, so a stage can read and rewrite the same
+    file. Otherwise each record is appended and flushed as it is written.
+    """
+
+    def __init__(self, file_path, atomic=True):
+        self.file_path = file_path
+        self.atomic = atomic
+        self.count = 0
+
+        folder = os.path.dirname(file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        if atomic:
+            self.file = open(file_path + ".tmp", "w", encoding="utf-8")
+        else:
+            self.file = open(file_path, "a", encoding="utf-8")
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if not self.atomic:
+            self.file.flush()
+        self.count += 1
+
+    def close(self, discard=False):
+        self.file.close()
+        if self.atomic:
+            if discard:
+                os.remove(self.file_path + ".tmp")
+            else:
+                os.replace(self.file_path + ".tmp", self.file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+
+def write_records(file_path, records):
+    """Write an iterable of records to ``file_path`` and return how many were written."""
+    with RecordWriter(file_path) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
@@ -0,0 +1,317 @@
+import collections
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+from dotenv import load_dotenv
+
+from .llm_cache import LLMCache
+from .tokens import estimate_tokens
+
+load_dotenv()
+
+# every knob can be overridden from .env
+MODEL = os.getenv("LLM_MODEL", "deepseek-chat")
+BASE_URL = os.getenv("LLM_BASE_URL", "https://api.deepseek.com/v1")
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "120"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "400000"))
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# an empty LLM_CACHE_PATH turns the response cache off
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "results/cache/llm_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+# crawl workers share the rate limits through this file; empty keeps them per process
+RATE_LIMIT_PATH = os.getenv("LLM_RATE_LIMIT_PATH", "results/cache/llm_rate_limit.db")
+
+# errors worth another attempt: 429, 5xx, timeouts and dropped connections
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute / 60`` per second."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        # a single request larger than the whole bucket waits for a full one
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(
+                    self.capacity, self.available + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """TokenBucket whose level lives in a SQLite file, shared by every process using it.
+
+    Each ``acquire`` refills and takes from the stored level inside one
+    ``BEGIN IMMEDIATE`` transaction, so the crawl workers and the
+    coordinator draw from the same budget instead of one bucket each.
+    """
+
+    def __init__(self, path, name, per_minute):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.name = name
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.lock = threading.Lock()
+
+        # shared by the LLM worker threads, serialized by self.lock
+        self.conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                available REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO buckets (name, available, updated) VALUES (?, ?, ?)",
+            (name, per_minute, time.time()),
+        )
+
+    def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                # wall clock, since monotonic time is not comparable across processes
+                now = time.time()
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    available, updated = self.conn.execute(
+                        "SELECT available, updated FROM buckets WHERE name = ?",
+                        (self.name,),
+                    ).fetchone()
+                    available = min(
+                        self.capacity,
+                        available + max(0.0, now - updated) * self.rate,
+                    )
+                    if available >= amount:
+                        available -= amount
+                        wait = 0
+                    else:
+                        wait = (amount - available) / self.rate
+                    self.conn.execute(
+                        "UPDATE buckets SET available = ?, updated = ? WHERE name = ?",
+                        (available, now, self.name),
+                    )
+                    self.conn.execute("COMMIT")
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class LLMExecutor:
+    """One DeepSeek client and thread pool shared by every utills stage.
+
+    ``chat`` blocks the calling thread until the answer arrives, after
+    taking its share of the requests-per-minute and tokens-per-minute
+    buckets. With ``rate_limit_path`` set the buckets are kept in that file,
+    so every process (e.g. each crawl worker) shares one budget. Rate limits (429), server errors and timeouts are retried with
+    exponential backoff and full jitter, honouring ``Retry-After``. The
+    pool runs independent calls concurrently through ``map``. A function
+    already running on the pool may call ``map`` once more (e.g. to fan out
+    the chunks of one large item); that inner level runs on a second pool so
+    the outer workers cannot starve it. Deeper nesting is not supported.
+
+    Replies are cached in an LLMCache when ``cache_path`` is set, so a
+    rerun over the same articles costs nothing. Bump a call site's
+    ``prompt_version`` when its prompt or reply parsing changes in a way the
+    prompt text alone does not show.
+    """
+
+    def __init__(
+        self,
+        model=MODEL,
+        base_url=BASE_URL,
+        max_concurrency=MAX_CONCURRENCY,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        timeout=TIMEOUT,
+        max_retries=MAX_RETRIES,
+        cache_path=CACHE_PATH,
+        cache_max_entries=CACHE_MAX_ENTRIES,
+        rate_limit_path=RATE_LIMIT_PATH,
+    ):
+        self.model = model
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        if rate_limit_path:
+            self.request_bucket = SharedTokenBucket(
+                rate_limit_path, "requests", requests_per_minute
+            )
+            self.token_bucket = SharedTokenBucket(
+                rate_limit_path, "tokens", tokens_per_minute
+            )
+        else:
+            self.request_bucket = TokenBucket(requests_per_minute)
+            self.token_bucket = TokenBucket(tokens_per_minute)
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="llm"
+        )
+        self.nested_pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="llm-nested"
+        )
+        self.local = threading.local()
+        self.cache = (
+            LLMCache(cache_path, max_entries=cache_max_entries) if cache_path else None
+        )
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # created on first use so importing utills does not need an API key
+        with self._client_lock:
+            if self._client is None:
+                self._client = openai.OpenAI(
+                    api_key=os.getenv("DEEPSEEK_API_KEY"),
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    max_retries=0,
+                )
+            return self._client
+
+    def chat(
+        self,
+        prompt,
+        temperature=0.7,
+        expected_output_tokens=1024,
+        prompt_version="1",
+        refresh_cache=False,
+        **kwargs,
+    ):
+        """Send one user ``prompt`` and return the reply text.
+
+        With ``refresh_cache`` the cached reply is ignored and replaced, e.g.
+        when the caller rejected it and is asking again.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        key = None
+        if self.cache:
+            key = LLMCache.make_key(
+                self.model,
+                prompt_version,
+                messages,
+                temperature=temperature,
+                **kwargs,
+            )
+            if not refresh_cache:
+                reply = self.cache.get(key)
+                if reply is not None:
+                    return reply
+
+        reply = self.request(messages, temperature, expected_output_tokens, **kwargs)
+        if key and reply is not None:
+            self.cache.put(key, reply)
+        return reply
+
+    def request(self, messages, temperature, expected_output_tokens, **kwargs):
+        tokens = estimate_tokens(messages[0]["content"]) + expected_output_tokens
+
+        for attempt in range(self.max_retries + 1):
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(tokens)
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    **kwargs,
+                )
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                print(
+                    f"LLM call failed ({e.__class__.__name__}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def backoff(self, attempt, error):
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(60.0, 2.0 * 2**attempt))
+
+    def map(self, func, items, window=None):
+        """Yield ``func(item)`` for every item, in order, running up to ``window`` at once."""
+        window = window or self.max_concurrency * 2
+        pool = self.nested_pool if getattr(self.local, "in_pool", False) else self.pool
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.submit(self._run_in_pool, func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _run_in_pool(self, func, item):
+        self.local.in_pool = True
+        return func(item)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = LLMExecutor()
+        return _executor
+
+
+def chat(prompt, **kwargs):
+    return get_executor().chat(prompt, **kwargs)
+
+
+def concurrent_map(func, items, window=None):
+    return get_executor().map(func, items, window=window)
+
+
+def cache_stats():
+    cache = get_executor().cache
+    return cache.stats() if cache else None
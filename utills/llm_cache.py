@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """Disk-backed cache of LLM replies, keyed by a hash of the whole request.
+
+    The key covers the model, a prompt-template version, the sampling
+    parameters and the messages, so any change to the prompt or its input
+    text is a miss. Entries remember when they were last read; once the
+    cache holds more than ``max_entries`` the least recently used ones are
+    evicted. Hit and miss counts are kept for the current process.
+    """
+
+    def __init__(self, path, max_entries=50000, evict_every=500):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+
+        # shared by the LLM worker threads, serialized by self.lock
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                reply TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model, version, messages, **params):
+        payload = json.dumps(
+            [model, version, messages, params], sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT reply FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key, reply):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO responses (key, reply, created, last_used)
+                   VALUES (?, ?, ?, ?)""",
+                (key, reply, now, now),
+            )
+            self.writes += 1
+            if self.writes % self.evict_every == 0:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        self.conn.execute(
+            """DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+    def close(self):
+        with self.lock:
+            self._evict()
+            self.conn.commit()
+            self.conn.close()
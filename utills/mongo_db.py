@@ -1,10 +1,11 @@
 import pymongo
-import json
+from pymongo import UpdateOne
 import os
 from tqdm import tqdm
 from datetime import datetime, timedelta, timezone
 import regex as re
 from bson.json_util import dumps
+from .jsonl import read_records
 
 
 def get_db(url="mongodb://localhost:27017/", db_name="scraper_db"):
@@ -21,13 +22,64 @@ def create_search_index():
         collection.create_index([("long_summary", "text")], default_language="none")
 
 
-def insert_unique_document(collection, data):
-    key = data.get("title") or data.get("representative_title")
+def create_id_index(collection):
+    # documents stored before ids were derived from urls may lack one
+    collection.create_index(
+        "id", unique=True, partialFilterExpression={"id": {"$exists": True}}
+    )
+
+
+def create_title_indexes(collection):
+    collection.create_index("title")
+    collection.create_index("representative_title")
+
+
+def document_key(data):
+    return data.get("title") or data.get("representative_title")
+
+
+def drop_duplicate_titles(collection, documents):
+    """Drop documents whose title is already stored under a different id.
+
+    One story published at two urls gets two ids, so ids alone do not catch
+    it across runs.
+    """
+    keys = list({document_key(document) for document in documents})
+    existing = collection.find(
+        {
+            "$or": [
+                {"title": {"$in": keys}},
+                {"representative_title": {"$in": keys}},
+            ]
+        },
+        {"id": 1, "title": 1, "representative_title": 1},
+    )
+    owners = {}
+    for document in existing:
+        for field in ("title", "representative_title"):
+            if document.get(field):
+                owners.setdefault(document[field], set()).add(document.get("id"))
+
+    unique = []
+    for document in documents:
+        key = document_key(document)
+        # the stored document keeps its title; otherwise the first in the batch does
+        if document["id"] not in owners.setdefault(key, {document["id"]}):
+            continue
+        unique.append(document)
+    return unique
+
+
+def prepare_document(data):
+    key = document_key(data)
     date = data.get("date_published")
 
     if not key:
         print("Document skipped: no title or representative_title.")
         return None
+    if not data.get("id"):
+        print(f"Document skipped: no id for '{key}'.")
+        return None
     if not date:
         print("Document skipped: no date.")
         return None
@@ -42,63 +94,76 @@ def insert_unique_document(collection, data):
             print(f"Error converting date_published for '{key}': {e}")
             return None  # Skip if invalid date
 
-    existing = collection.find_one(
-        {"$or": [{"title": key}, {"representative_title": key}]}
-    )
+    return data
 
-    if existing:
-        print(f"Duplicate found for key: '{key}'. Skipping insertion.")
-        return None
-    else:
-        collection.insert_one(data)
-        return data
 
+def upsert_documents(collection, documents):
+    """Insert new documents and update changed ones, keyed on ``id``."""
+    requests = [
+        UpdateOne({"id": document["id"]}, {"$set": document}, upsert=True)
+        for document in documents
+    ]
+    if not requests:
+        return 0, 0
+
+    result = collection.bulk_write(requests, ordered=False)
+    return result.upserted_count, result.modified_count
 
-def insert_data(json_file_path):
+
+def insert_data(json_file_path, batch_size=500):
     try:
         if not os.path.exists(json_file_path):
             raise FileNotFoundError(f"File '{json_file_path}' does not exist.")
 
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            try:
-                articles = json.load(file)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON format: {e}")
-
-        if not isinstance(articles, list):
-            raise ValueError("The JSON file must contain a list of articles.")
-
         db = get_db()
         inserted_count = 0
+        updated_count = 0
         skipped_count = 0
+        duplicate_count = 0
+        batches = {}
+        indexed = set()
+
+        def flush(category):
+            nonlocal inserted_count, updated_count, duplicate_count
+            collection = db[category]
+            if category not in indexed:
+                create_id_index(collection)
+                create_title_indexes(collection)
+                indexed.add(category)
+
+            batch = list(batches.pop(category).values())
+            documents = drop_duplicate_titles(collection, batch)
+            duplicate_count += len(batch) - len(documents)
+            inserted, updated = upsert_documents(collection, documents)
+            inserted_count += inserted
+            updated_count += updated
+
+        for article in tqdm(
+            read_records(json_file_path), desc="Inserting articles", unit="article"
+        ):
+            if article.get("group_id") and len(article.get("articles", [])) == 0:
+                continue
 
-        total_items = sum(
-            len(article.get("articles", []))
-            if article.get("group_id") and article.get("articles")
-            else 1
-            for article in articles
-            if not (article.get("group_id") and not article.get("articles"))
-        )
-
-        with tqdm(total=total_items, desc="Inserting articles", unit="article") as pbar:
-            for article in articles:
-                if article.get("group_id") and len(article.get("articles", [])) == 0:
-                    pbar.update(1)
-                    continue
+            document = prepare_document(article)
+            if not document:
+                skipped_count += 1
+                continue
 
-                collection = db[article["category"]]
+            batch = batches.setdefault(article["category"], {})
+            # the last copy of an id in the file wins
+            batch[document["id"]] = document
+            if len(batch) >= batch_size:
+                flush(article["category"])
 
-                status = insert_unique_document(collection, article)
-                if status:
-                    inserted_count += 1
-                else:
-                    skipped_count += 1
-                pbar.update(1)
+        for category in list(batches):
+            flush(category)
 
         create_search_index()
 
         print(
-            f"Inserted {inserted_count} article(s). Skipped {skipped_count} duplicate(s)."
+            f"Inserted {inserted_count} article(s). Updated {updated_count}. "
+            f"Skipped {duplicate_count} duplicate(s) and "
+            f"{skipped_count} invalid record(s)."
         )
 
         return True
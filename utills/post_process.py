@@ -1,7 +1,7 @@
-import json
 import os
 from tqdm import tqdm
 from datetime import datetime
+from .jsonl import read_records, write_records
 
 
 def remove_duplicates_by_title(json_file_path):
@@ -9,36 +9,28 @@ def remove_duplicates_by_title(json_file_path):
         if not os.path.exists(json_file_path):
             raise FileNotFoundError(f"File '{json_file_path}' does not exist.")
 
-        # Load JSON file
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            try:
-                articles = json.load(file)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON format: {e}")
-
-        if not isinstance(articles, list):
-            raise ValueError("The JSON file must contain a list of articles.")
-
-        # Remove duplicates based on title
+        seen_ids = set()
         seen_titles = set()
-        unique_articles = []
         duplicates_removed = 0
 
-        with tqdm(
-            total=len(articles), desc="Removing duplicates", unit="article"
-        ) as pbar:
-            for article in articles:
+        def unique_articles():
+            nonlocal duplicates_removed
+            for article in tqdm(
+                read_records(json_file_path), desc="Removing duplicates", unit="article"
+            ):
+                # the same url always has the same id; titles still catch
+                # one story published under two urls
+                article_id = article.get("id")
                 title = article.get("title")
-                if title and title not in seen_titles:
+                if title and title not in seen_titles and article_id not in seen_ids:
                     seen_titles.add(title)
-                    unique_articles.append(article)
+                    if article_id:
+                        seen_ids.add(article_id)
+                    yield article
                 else:
                     duplicates_removed += 1
-                pbar.update(1)
 
-        # Overwrite the original file with cleaned data
-        with open(json_file_path, "w", encoding="utf-8") as file:
-            json.dump(unique_articles, file, ensure_ascii=False, indent=4)
+        write_records(json_file_path, unique_articles())
 
         print(
             f"Removed {duplicates_removed} duplicate(s). Cleaned data saved to '{json_file_path}'"
@@ -58,27 +50,28 @@ def add_id_to_grouped_articles(json_file_path):
         if not os.path.exists(json_file_path):
             raise FileNotFoundError(f"File '{json_file_path}' does not exist.")
 
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            try:
-                articles = json.load(file)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON format: {e}")
-
-        if not isinstance(articles, list):
-            raise ValueError("The JSON file must contain a list of articles.")
-
-        for article in tqdm(
-            articles, desc="Assigning ids to grouped articles", unit="article"
-        ):
-            if article.get("group_id") and len(article.get("articles")) != 0:
-                article["id"] = article.get("articles")[0].get("id")
-                article["category"] = article.get("articles")[0].get("category")
-                article["date_published"] = article.get("articles")[0].get(
-                    "date_published"
-                )
-
-        with open(json_file_path, "w", encoding="utf-8") as file:
-            json.dump(articles, file, ensure_ascii=False, indent=4)
+        def articles_with_ids():
+            for article in tqdm(
+                read_records(json_file_path),
+                desc="Assigning ids to grouped articles",
+                unit="article",
+            ):
+                if article.get("group_id") and len(article.get("articles")) != 0:
+                    # the smallest member id does not depend on member order,
+                    # so a regrouped story upserts the same document next run
+                    member_ids = [
+                        member["id"]
+                        for member in article.get("articles")
+                        if member.get("id")
+                    ]
+                    article["id"] = min(member_ids) if member_ids else None
+                    article["category"] = article.get("articles")[0].get("category")
+                    article["date_published"] = article.get("articles")[0].get(
+                        "date_published"
+                    )
+                yield article
+
+        write_records(json_file_path, articles_with_ids())
 
         print(f"Results saved to '{json_file_path}'")
         return json_file_path
@@ -91,32 +84,29 @@ def add_id_to_grouped_articles(json_file_path):
         print(f"Unexpected error: {e}")
 
 
-def assign_week_label(json_file_path):
-    with open(json_file_path, "r", encoding="utf-8") as file:
-        try:
-            articles = json.load(file)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON format: {e}")
-
-    for article in articles:
-        date_str = article.get("date_published")
-        if not date_str:
-            continue
+def get_week_label(date_str):
+    """Return the 'YYYY_MM_WEEKn' label for an ISO 'date_published' string."""
+    if not date_str:
+        return None
 
-        try:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
-        except ValueError:
-            continue
+    try:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
+    except ValueError:
+        return None
 
-        year = date_obj.year
-        month = date_obj.month
-        day = date_obj.day
+    week_of_month = (date_obj.day - 1) // 7 + 1
 
-        week_of_month = (day - 1) // 7 + 1
+    return f"{date_obj.year}_{str(date_obj.month).zfill(2)}_WEEK{week_of_month}"
 
-        article["week"] = f"{year}_{str(month).zfill(2)}_WEEK{week_of_month}"
 
-    with open(json_file_path, "w", encoding="utf-8") as file:
-        json.dump(articles, file, ensure_ascii=False, indent=4)
+def assign_week_label(json_file_path):
+    def labelled_articles():
+        for article in read_records(json_file_path):
+            week = get_week_label(article.get("date_published"))
+            if week:
+                article["week"] = week
+            yield article
+
+    write_records(json_file_path, labelled_articles())
 
     return json_file_path
@@ -1,19 +1,17 @@
 import json
 import os
 import datetime
-from dotenv import load_dotenv
-import openai
 from tqdm import tqdm
 from .mongo_db import get_this_weeks_news
+from .jsonl import RecordWriter, read_records
+from .llm import cache_stats, chat, concurrent_map
+from .tokens import estimate_tokens, pack_texts, truncate_to_tokens
 import re
 
-
-# Load API key from .env
-load_dotenv()
-deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-
-# Initialize OpenAI client for DeepSeek
-client = openai.OpenAI(api_key=deepseek_api_key, base_url="https://api.deepseek.com/v1")
+PROMPT_VERSION = "summaries-1"
+# largest text, in estimated tokens, sent to the model in one summary request
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "6000"))
+SUMMARY_ERROR = "News lead not available due to an error."
 
 
 def generate_summary(text, is_grouped=False, is_short=True):
@@ -37,22 +35,115 @@ def generate_summary(text, is_grouped=False, is_short=True):
                 f"{text}"
             )
 
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
+        return chat(prompt, temperature=0.7)
+
+    except Exception as e:
+        print(f"Error generating news lead: {e}")
+        return SUMMARY_ERROR
+
+
+def parse_summaries(reply):
+    """Return (short_summary, long_summary) from a JSON reply, or None if it is unusable."""
+    try:
+        summaries = json.loads(reply)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(summaries, dict):
+        return None
+
+    short_summary = summaries.get("short_summary")
+    long_summary = summaries.get("long_summary")
+    if not isinstance(short_summary, str) or not isinstance(long_summary, str):
+        return None
+
+    short_summary = short_summary.strip()
+    long_summary = long_summary.strip()
+    # the lead is one sentence; anything longer than the summary itself is wrong
+    if not short_summary or not long_summary or len(short_summary) > len(long_summary):
+        return None
+    return short_summary, long_summary
+
+
+def generate_summaries(text, is_grouped=False):
+    """Generate the news lead and the full summary of ``text`` with a single request.
+
+    Falls back to two generate_summary calls when the reply is not the
+    expected JSON.
+    """
+    subject = "collection of news articles" if is_grouped else "news article"
+    prompt = (
+        f"Write two summaries in Sinhala for the following {subject}. "
+        '"short_summary" is an effective news lead: a single sentence, ideally 20-25 words long, that delivers a sharp statement of the story\'s essential facts. '
+        '"long_summary" is a good summary that must contain all the things; its length does not matter but it must cover all the aspects. '
+        "For both, balance maximum information with readability. Focus on summarizing the most significant details, addressing as many of the five Ws (Who, What, When, Where, Why) as possible. "
+        'Respond only with a JSON object of the form {"short_summary": "...", "long_summary": "..."}. '
+        f"{text}"
+    )
+
+    try:
+        reply = chat(
+            prompt,
             temperature=0.7,
+            expected_output_tokens=2048,
+            prompt_version=PROMPT_VERSION,
+            response_format={"type": "json_object"},
         )
+        summaries = parse_summaries(reply)
+        if summaries:
+            return summaries
+        print("Could not parse the combined summary; generating the two separately.")
+    except Exception as e:
+        print(f"Error generating summaries: {e}")
 
-        return response.choices[0].message.content
+    return (
+        generate_summary(text, is_grouped=is_grouped, is_short=True),
+        generate_summary(text, is_grouped=is_grouped, is_short=False),
+    )
 
-    except Exception as e:
-        print(f"Error generating news lead: {e}")
-        return "News lead not available due to an error."
+
+def summarize_within_budget(
+    texts, is_grouped=False, token_budget=SUMMARY_TOKEN_BUDGET
+):
+    """Generate (short_summary, long_summary) for ``texts`` of any size.
+
+    Texts that fit in ``token_budget`` go to generate_summaries as one
+    request. Larger ones are map-reduced: the texts are packed, whole
+    articles where possible, into chunks within the budget, the chunks are
+    summarized concurrently, and the partial summaries (reduced again while
+    they are still over budget) are summarized into the final pair.
+    """
+    combined_text = " ".join(texts)
+    if estimate_tokens(combined_text) <= token_budget:
+        return generate_summaries(combined_text, is_grouped=is_grouped)
+
+    def summarize_chunk(chunk):
+        return generate_summary(chunk, is_grouped=is_grouped, is_short=False)
+
+    partials = list(texts)
+    rounds = 0
+    while estimate_tokens(" ".join(partials)) > token_budget:
+        if rounds == 3:
+            # still over budget; give every partial summary an equal share
+            share = token_budget // len(partials)
+            partials = [truncate_to_tokens(partial, share) for partial in partials]
+            break
+
+        chunks = pack_texts(partials, token_budget)
+        partials = [
+            partial
+            for partial in concurrent_map(summarize_chunk, chunks)
+            if partial != SUMMARY_ERROR
+        ]
+        if not partials:
+            return SUMMARY_ERROR, SUMMARY_ERROR
+        rounds += 1
+
+    return generate_summaries(" ".join(partials), is_grouped=is_grouped)
 
 
 def summarize_articles(json_file_path, output_folder):
     """
-    Load articles from a JSON file, process them, and save the final structured JSON.
+    Stream articles from a JSON Lines file, summarize them, and save the results as JSON Lines.
     json_file_path: input json file path which contains clustered news
     output_folder: folder path where results will be saved
     """
@@ -60,59 +151,43 @@ def summarize_articles(json_file_path, output_folder):
         if not os.path.exists(json_file_path):
             raise FileNotFoundError(f"File '{json_file_path}' does not exist.")
 
-        # Load JSON file
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            try:
-                articles = json.load(file)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON format: {e}")
-
-        if not isinstance(articles, list):
-            raise ValueError("The JSON file must contain a list of articles.")
-
         print("Summarization started...")
 
-        for item in tqdm(articles, desc="Processing articles", unit="article"):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        output_filename = f"final_news_data_{timestamp}.jsonl"
+        output_filepath = os.path.join(output_folder, output_filename)
+
+        def summarize_item(item):
             try:
                 if "group_id" in item:
-                    combined_text = " ".join(
-                        article["content"] for article in item["articles"]
-                    )
-                    short_summary = generate_summary(
-                        combined_text, is_grouped=True, is_short=True
-                    )
-                    long_summary = generate_summary(
-                        combined_text, is_grouped=True, is_short=False
+                    short_summary, long_summary = summarize_within_budget(
+                        [article["content"] for article in item["articles"]],
+                        is_grouped=True,
                     )
-
-                    item["short_summary"] = short_summary
-                    item["long_summary"] = long_summary
                 else:
-                    short_summary = generate_summary(
-                        item["content"], is_grouped=False, is_short=True
-                    )
-                    long_summary = generate_summary(
-                        item["content"], is_grouped=False, is_short=False
+                    short_summary, long_summary = summarize_within_budget(
+                        [item["content"]], is_grouped=False
                     )
 
-                    item["short_summary"] = short_summary
-                    item["long_summary"] = long_summary
+                item["short_summary"] = short_summary
+                item["long_summary"] = long_summary
             except KeyError as ke:
                 print(f"Missing key in article data: {ke}")
             except Exception as e:
                 print(f"Error processing article: {e}")
+            return item
 
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-        output_filename = f"final_news_data_{timestamp}.json"
-        output_filepath = os.path.join(output_folder, output_filename)
-
-        os.makedirs(output_folder, exist_ok=True)
-
-        # Save to JSON file
-        with open(output_filepath, "w", encoding="utf-8") as file:
-            json.dump(articles, file, ensure_ascii=False, indent=4)
+        # items are summarized concurrently and written back in input order
+        with RecordWriter(output_filepath) as writer:
+            for item in tqdm(
+                concurrent_map(summarize_item, read_records(json_file_path)),
+                desc="Processing articles",
+                unit="article",
+            ):
+                writer.write(item)
 
         print(f"Final processed news data saved to '{output_filepath}'")
+        print(f"LLM cache: {cache_stats()}")
         return output_filepath
 
     except FileNotFoundError as fnf_error:
@@ -139,17 +214,11 @@ def clean_json_text(json_data):
     return cleaned_data
 
 
-def create_feature_article():
-    weekly_summary_dict = {}
-    article_dict = get_this_weeks_news()
-    for category, articles in article_dict.items():
-        if len(articles) == 0:
-            continue
-
-        try:
-            joined_articles = ", ".join(articles)
+def generate_feature_article(category, articles):
+    try:
+        joined_articles = ", ".join(articles)
 
-            prompt = f"""
+        prompt = f"""
             '{category}' ප්‍රවර්ගයට අයත්, මෙම සතියේ සටහන් වූ සියලුම ප්‍රවෘත්ති විෂයයන් සවිස්තරව විශ්ලේෂණය කරමින්, 
             නිරපේක්ෂ, තරකාරහිත, විශ්වාසනීය සහ සාක්ෂාත්මක තොරතුරු මත පදනම්ව සංකීර්ණ වූ විශේෂාංග ලිපියක් (feature article) රචනා කරන්න. 
             ලිපිය ලියීමේදී පසුපස කතාවක් (background), වත්මන් තත්වය (current situation), බලපෑම් (impacts), 
@@ -162,18 +231,25 @@ def create_feature_article():
                 භාවිතා කළ යුතු පද පෙළ, පහත දැක්වෙන {joined_articles} යි.
             """
 
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-            )
+        return chat(prompt, temperature=0.7, expected_output_tokens=2048)
+
+    except Exception as e:
+        print(f"Error generating summary for {category}: {e}")
+        return "Summary not available due to an error."
 
-            summary = response.choices[0].message.content
-            weekly_summary_dict[category] = summary
 
-        except Exception as e:
-            print(f"Error generating summary for {category}: {e}")
-            weekly_summary_dict[category] = "Summary not available due to an error."
+def create_feature_article():
+    article_dict = get_this_weeks_news()
+    categories = [
+        category for category, articles in article_dict.items() if len(articles) != 0
+    ]
+
+    # one feature article per category, written concurrently
+    summaries = concurrent_map(
+        lambda category: generate_feature_article(category, article_dict[category]),
+        categories,
+    )
+    weekly_summary_dict = dict(zip(categories, summaries))
 
     output_path = os.path.join(r"results\feature_articles", "weekly_summary.json")
     with open(output_path, "w", encoding="utf-8") as f:
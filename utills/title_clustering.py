@@ -0,0 +1,148 @@
+import json
+
+import numpy as np
+from scipy.sparse import csr_matrix, triu
+from scipy.sparse.csgraph import connected_components
+
+
+def char_ngrams(title, ngram_range=(3, 3)):
+    padded = f" {title} "
+    low, high = ngram_range
+    return [
+        padded[start : start + size]
+        for size in range(low, high + 1)
+        for start in range(len(padded) - size + 1)
+    ]
+
+
+def tfidf_vectors(titles, ngram_range=(3, 3), max_df=0.05, min_max_df=20):
+    """L2-normalized character n-gram TF-IDF rows, one per title.
+
+    N-grams found in more than ``max_df`` of the titles, and in more than
+    ``min_max_df`` titles (so a story covered by every source survives small
+    runs), are dropped: they are common suffixes and particles that add
+    little and make the similarity matrix dense.
+    """
+    vocabulary = {}
+    rows = []
+    cols = []
+    for row, title in enumerate(titles):
+        for gram in char_ngrams(title, ngram_range):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(gram, len(vocabulary)))
+
+    shape = (len(titles), len(vocabulary))
+    counts = csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape
+    )
+    counts.sum_duplicates()
+
+    document_frequency = np.bincount(counts.indices, minlength=shape[1])
+    idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+    idf[document_frequency > max(min_max_df, max_df * shape[0])] = 0
+
+    vectors = counts.multiply(idf.astype(np.float32)).tocsr()
+    vectors.eliminate_zeros()
+    norms = np.sqrt(vectors.multiply(vectors).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return csr_matrix(vectors.multiply(1 / norms[:, None]))
+
+
+def similar_pairs(vectors, min_similarity):
+    """Upper-triangle (i, j, similarity) of title pairs at or above ``min_similarity``."""
+    similarities = triu(vectors @ vectors.T, k=1).tocoo()
+    keep = similarities.data >= min_similarity
+    return similarities.row[keep], similarities.col[keep], similarities.data[keep]
+
+
+def confirm_pairs_with_llm(titles, pairs, batch_size=40):
+    """Ask the LLM which borderline (i, j) title pairs report the same story."""
+    from .llm import chat
+
+    confirmed = []
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start : start + batch_size]
+        listing = "\n".join(
+            f'{number}. "{titles[i]}" | "{titles[j]}"'
+            for number, (i, j) in enumerate(batch, start=1)
+        )
+        prompt = f"""For each numbered pair of Sinhala news titles below, decide whether
+    both titles report the same news story. Respond with a JSON object mapping every
+    number to true or false, e.g. {{"1": true, "2": false}}. Do not include any additional text.
+
+    {listing}
+    """
+        try:
+            reply = chat(
+                prompt,
+                temperature=0,
+                expected_output_tokens=8 * len(batch),
+                prompt_version="title-pairs-1",
+                response_format={"type": "json_object"},
+            )
+            answers = json.loads(reply)
+        except Exception as e:
+            print(f"Error confirming borderline titles: {e}")
+            continue
+        if not isinstance(answers, dict):
+            continue
+
+        for number, pair in enumerate(batch, start=1):
+            if answers.get(str(number)) is True:
+                confirmed.append(pair)
+    return confirmed
+
+
+def group_titles(
+    titles,
+    threshold=0.55,
+    borderline=0.35,
+    use_llm=False,
+    ngram_range=(3, 3),
+):
+    """Group near-duplicate titles; returns a list of groups of title indices.
+
+    Titles are linked when the cosine similarity of their character n-gram
+    TF-IDF vectors reaches ``threshold``, and groups are the connected
+    components of those links; titles linked to nothing are left out. With
+    ``use_llm``, pairs scoring between ``borderline`` and ``threshold`` are
+    sent to the LLM and linked only if it confirms they are the same story.
+    Each group is ordered with its most central title first.
+    """
+    if len(titles) < 2:
+        return []
+
+    vectors = tfidf_vectors(titles, ngram_range)
+    rows, cols, scores = similar_pairs(vectors, borderline if use_llm else threshold)
+
+    strong = scores >= threshold
+    links_from = list(rows[strong])
+    links_to = list(cols[strong])
+    if use_llm:
+        weak = list(zip(rows[~strong].tolist(), cols[~strong].tolist()))
+        for i, j in confirm_pairs_with_llm(titles, weak):
+            links_from.append(i)
+            links_to.append(j)
+
+    graph = csr_matrix(
+        (np.ones(len(links_from)), (links_from, links_to)),
+        shape=(len(titles), len(titles)),
+    )
+    _, labels = connected_components(graph, directed=False)
+
+    groups = {}
+    for index, label in enumerate(labels):
+        groups.setdefault(label, []).append(index)
+
+    ordered_groups = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        # representative title: the highest total similarity to the rest
+        member_vectors = vectors[members]
+        centrality = (member_vectors @ member_vectors.T).sum(axis=1).A1
+        order = np.argsort(-centrality, kind="stable")
+        ordered_groups.append([members[k] for k in order])
+
+    ordered_groups.sort(key=lambda members: min(members))
+    return ordered_groups
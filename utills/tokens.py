@@ -0,0 +1,84 @@
+import re
+
+# Sinhala script (U+0D80-U+0DFF) is split into roughly one token per
+# character by the DeepSeek/OpenAI byte-level tokenizers; Latin text and
+# digits average about four characters per token.
+SINHALA_CHARS = re.compile("[\u0d80-\u0dff\u200c\u200d]")
+OTHER_CHARS = re.compile("[^\\s\u0d80-\u0dff\u200c\u200d]")
+SINHALA_CHARS_PER_TOKEN = 1.0
+OTHER_CHARS_PER_TOKEN = 4.0
+
+
+def estimate_tokens(text):
+    """Rough, slightly pessimistic token count of ``text`` without a tokenizer."""
+    if not text:
+        return 0
+
+    sinhala = len(SINHALA_CHARS.findall(text))
+    other = len(OTHER_CHARS.findall(text))
+    return int(
+        sinhala / SINHALA_CHARS_PER_TOKEN + other / OTHER_CHARS_PER_TOKEN + 0.999
+    )
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Return the leading words of ``text`` that fit in about ``max_tokens`` tokens."""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept = []
+    used = 0
+    for word in text.split():
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        kept.append(word)
+        used += cost
+    return " ".join(kept)
+
+
+def split_to_tokens(text, max_tokens):
+    """Split ``text`` on word boundaries into pieces of about ``max_tokens`` tokens each."""
+    pieces = []
+    words = []
+    used = 0
+    for word in text.split():
+        cost = estimate_tokens(word)
+        if words and used + cost > max_tokens:
+            pieces.append(" ".join(words))
+            words = []
+            used = 0
+        words.append(word)
+        used += cost
+    if words:
+        pieces.append(" ".join(words))
+    return pieces
+
+
+def pack_texts(texts, max_tokens, separator=" "):
+    """Group ``texts`` in order into chunks of at most about ``max_tokens`` tokens.
+
+    Texts are never split unless a single one is larger than the budget on
+    its own.
+    """
+    chunks = []
+    current = []
+    used = 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if cost > max_tokens:
+            pieces = split_to_tokens(text, max_tokens)
+        else:
+            pieces = [text]
+
+        for piece in pieces:
+            cost = estimate_tokens(piece)
+            if current and used + cost > max_tokens:
+                chunks.append(separator.join(current))
+                current = []
+                used = 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append(separator.join(current))
+    return chunks